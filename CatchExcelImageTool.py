@@ -14,24 +14,103 @@ CatchExcelImage.py
 """
 
 from __future__ import annotations
+import logging
 import os
+import posixpath
+import shutil
+import threading
 import zipfile
-import xml.etree.ElementTree as ET
 import openpyxl
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
 import re
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from itertools import chain
+
+try:
+    # lxml 解析大型XML明显更快，未安装时回退到标准库
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+# 作为主程序日志记录器（core.setup_logging 配置的 ExcelToPDFProcessor）的子记录器，提取错误同样写入 app.log
+logger = logging.getLogger('ExcelToPDFProcessor.images')
+
+# cellimages.xml 中用到的完全限定标签名，避免每次查找时解析命名空间映射
+_XDR_NS = 'http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing'
+_A_NS = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+_PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_DOC_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_PIC_Q = f'{{{_XDR_NS}}}pic'
+_CNVPR_Q = f'{{{_XDR_NS}}}cNvPr'
+_BLIP_Q = f'{{{_A_NS}}}blip'
+_RELATIONSHIP_Q = f'{{{_PKG_REL_NS}}}Relationship'
+_EMBED_ATTR = f'{{{_DOC_REL_NS}}}embed'
+
+# 工作簿/工作表XML中用到的完全限定标签名（直接扫描 sheet*.xml 时使用）
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_SHEET_Q = f'{{{_MAIN_NS}}}sheet'
+_ROW_Q = f'{{{_MAIN_NS}}}row'
+_CELL_Q = f'{{{_MAIN_NS}}}c'
+_FORMULA_Q = f'{{{_MAIN_NS}}}f'
+_RID_ATTR = f'{{{_DOC_REL_NS}}}id'
+
+# drawing*.xml 中浮动图片锚点相关的完全限定标签名
+_ONE_CELL_ANCHOR_Q = f'{{{_XDR_NS}}}oneCellAnchor'
+_TWO_CELL_ANCHOR_Q = f'{{{_XDR_NS}}}twoCellAnchor'
+_FROM_Q = f'{{{_XDR_NS}}}from'
+_ANCHOR_ROW_Q = f'{{{_XDR_NS}}}row'
+_ANCHOR_COL_Q = f'{{{_XDR_NS}}}col'
+_DRAWING_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/drawing'
+
+# DISPIMG公式中的图片ID，如 =_xlfn.DISPIMG("ID_xxx",1)
+_DISPIMG_RE = re.compile(r'_xlfn\.DISPIMG\("([^"]+)"')
+
+# 从zip中流式拷贝图片时使用的缓冲区大小
+_BUFSIZE = 1 << 20
+
+# 已解压图片字节的LRU缓存：按总字节数而非条目数限制容量，超过单项上限的图片直接流式拷贝
+_MEMBER_CACHE_MAX_BYTES = 64 << 20
+_MEMBER_CACHE_MAX_ITEM = 8 << 20
+
+
+def _env_int(name: str, default: int) -> int:
+    """读取整数环境变量；为空或不是数字时使用默认值，结果至少为1"""
+    try:
+        value = int(os.environ.get(name, '').strip() or default)
+    except ValueError:
+        value = default
+    return max(1, value)
+
+
+# 并行提取图片时的最大线程数，可通过环境变量 EXTRACT_WORKERS 调整
+EXTRACT_WORKERS = _env_int('EXTRACT_WORKERS', 8)
 
 # 全局缓存：存储工作表的图片位置映射
 _image_position_cache = {}
+# 全局缓存：{(xlsx_path, mtime): 只读workbook}，文件修改后重新加载
 _workbook_cache = {}
+# 全局缓存：{(xlsx_path, mtime): {image_id -> image内部路径}}，文件修改后自动失效
+_id_map_cache: Dict[Tuple[str, float], Dict[str, str]] = {}
+# 全局缓存：{(xlsx_path, mtime): [xl/media/ 下的图片内部路径]}
+_media_index_cache: Dict[Tuple[str, float], List[str]] = {}
+# 全局缓存：{(xlsx_path, mtime, zip内部路径): 图片字节}，LRU顺序；提取线程池会并发访问，需加锁
+_member_cache: OrderedDict = OrderedDict()
+_member_cache_bytes = 0
+_member_cache_lock = threading.Lock()
+
+# 可识别的浮动图片扩展名（不含点）；按单个图片兜底提取时只使用常见格式子集
+_IMG_EXTS = frozenset(('png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'webp'))
+_COMMON_IMG_EXTS = frozenset(('png', 'jpg', 'jpeg', 'gif', 'bmp'))
 
 # ----------------------------------------------------------
 # 内部工具函数
 # ----------------------------------------------------------
 
-def _build_image_position_cache(xlsx_path: str, sheet_name: str) -> Dict[Tuple[int, int], int]:
+def _build_image_position_cache(xlsx_path: str, sheet_name: str) -> Dict[Tuple[int, int], str]:
     """
-    构建图片位置缓存，返回 {(row, col): image_index} 的映射
+    构建图片位置缓存，返回 {(row, col): 图片在zip中的内部路径} 的映射
+    直接解析工作表对应的 drawing*.xml，无需openpyxl构造图片对象
     只在第一次访问时构建，后续直接使用缓存
     """
     cache_key = f"{xlsx_path}#{sheet_name}"
@@ -42,134 +121,413 @@ def _build_image_position_cache(xlsx_path: str, sheet_name: str) -> Dict[Tuple[i
     position_map = {}
     
     try:
-        # 检查是否已经有缓存的workbook
-        if xlsx_path in _workbook_cache:
-            wb = _workbook_cache[xlsx_path]
-        else:
-            wb = openpyxl.load_workbook(xlsx_path, data_only=False)
-            _workbook_cache[xlsx_path] = wb
-        
-        if sheet_name not in wb.sheetnames:
-            _image_position_cache[cache_key] = position_map
-            return position_map
-        
-        ws = wb[sheet_name]
+        with zipfile.ZipFile(xlsx_path, 'r') as z:
+            sheet_part = _get_sheet_parts(z).get(sheet_name)
+            if sheet_part:
+                position_map = _parse_drawing_positions(z, sheet_part)
         
-        if hasattr(ws, '_images') and ws._images:
-            print(f"缓存构建: 发现 {len(ws._images)} 个图片，正在构建位置映射...")
-            
-            for i, img in enumerate(ws._images):
-                try:
-                    if hasattr(img, 'anchor'):
-                        anchor = img.anchor
-                        
-                        img_row = None
-                        img_col = None
-                        
-                        # 检查不同类型的锚点
-                        if hasattr(anchor, '_from'):
-                            anchor_from = anchor._from
-                            if hasattr(anchor_from, 'row') and hasattr(anchor_from, 'col'):
-                                img_row = anchor_from.row + 1  # 转换为1基索引
-                                img_col = anchor_from.col + 1
-                        elif hasattr(anchor, 'col') and hasattr(anchor, 'row'):
-                            img_row = anchor.row + 1
-                            img_col = anchor.col + 1
-                        
-                        if img_row is not None and img_col is not None:
-                            position_map[(img_row, img_col)] = i
-                            print(f"缓存构建: 图片{i} -> 位置({img_row}, {img_col})")
-                        
-                except Exception as e:
-                    print(f"缓存构建: 处理图片{i}时出错: {e}")
-                    continue
-            
-            print(f"缓存构建完成: 共映射 {len(position_map)} 个图片位置")
+        logger.debug("缓存构建完成: 共映射 %d 个图片位置", len(position_map))
         
     except Exception as e:
-        print(f"构建图片位置缓存时出错: {e}")
+        logger.error("构建图片位置缓存时出错: %s", e)
     
     _image_position_cache[cache_key] = position_map
     return position_map
 
 def _get_cached_workbook(xlsx_path: str):
     """
-    获取缓存的workbook，避免重复加载
+    获取缓存的workbook，避免重复加载，按 (路径, 修改时间) 缓存，文件修改后重新加载
+    以只读模式加载：只需读取单元格值，浮动图片位置直接解析drawing XML
+    只读workbook会一直占用文件句柄，用完后调用 close_cached_workbooks 释放
+    """
+    cache_key = (xlsx_path, os.path.getmtime(xlsx_path))
+    if cache_key not in _workbook_cache:
+        # 同一文件的旧版本已失效，关闭并移除
+        for stale_key in [key for key in _workbook_cache if key[0] == xlsx_path]:
+            _close_workbook(_workbook_cache.pop(stale_key))
+        _workbook_cache[cache_key] = openpyxl.load_workbook(
+            xlsx_path, read_only=True, data_only=False, keep_links=False)
+    return _workbook_cache[cache_key]
+
+def _close_workbook(wb) -> None:
+    """关闭workbook并释放文件句柄，忽略关闭时的错误"""
+    try:
+        wb.close()
+    except Exception:
+        pass
+
+def close_cached_workbooks():
+    """
+    关闭所有缓存的workbook，释放对Excel文件的占用（Windows下被占用的文件无法在Excel中保存）
     """
-    if xlsx_path not in _workbook_cache:
-        _workbook_cache[xlsx_path] = openpyxl.load_workbook(xlsx_path, data_only=False)
-    return _workbook_cache[xlsx_path]
+    for wb in _workbook_cache.values():
+        _close_workbook(wb)
+    _workbook_cache.clear()
 
 def clear_image_cache():
     """
     清除图片缓存（用于释放内存或重新加载）
     """
-    global _image_position_cache, _workbook_cache
+    global _image_position_cache, _workbook_cache, _id_map_cache, _media_index_cache
+    global _member_cache_bytes
     
     # 关闭所有缓存的workbook
-    for wb in _workbook_cache.values():
-        try:
-            wb.close()
-        except:
-            pass
+    close_cached_workbooks()
     
     _image_position_cache.clear()
-    _workbook_cache.clear()
-    print("图片缓存已清除")
-def _extract_dispimg_ids(ws: openpyxl.worksheet.worksheet.Worksheet,
-                         target_col: Optional[str] = None) -> List[str]:
+    _id_map_cache.clear()
+    _media_index_cache.clear()
+    with _member_cache_lock:
+        _member_cache.clear()
+        _member_cache_bytes = 0
+    logger.info("图片缓存已清除")
+
+
+def _get_cached_member(key: Tuple[str, float, str]) -> Optional[bytes]:
+    """从LRU缓存中取出已解压的图片字节，命中时移到最近使用端"""
+    with _member_cache_lock:
+        data = _member_cache.get(key)
+        if data is not None:
+            _member_cache.move_to_end(key)
+        return data
+
+
+def _put_cached_member(key: Tuple[str, float, str], data: bytes) -> None:
+    """写入LRU缓存，总字节数超出上限时淘汰最久未使用的条目"""
+    global _member_cache_bytes
+    with _member_cache_lock:
+        if key in _member_cache:
+            return
+        _member_cache[key] = data
+        _member_cache_bytes += len(data)
+        while _member_cache_bytes > _MEMBER_CACHE_MAX_BYTES and _member_cache:
+            _, evicted = _member_cache.popitem(last=False)
+            _member_cache_bytes -= len(evicted)
+
+
+def _copy_zip_member(z: zipfile.ZipFile, member: str, out_file: str) -> None:
+    """
+    将zip中的成员写入目标文件
+    较小的图片解压后放入LRU缓存，同一图片被多次提取时无需重复解压；
+    超过单项上限的大图片直接流式写入，不在内存中完整缓存
+    """
+    key = (z.filename, os.path.getmtime(z.filename), member)
+    data = _get_cached_member(key)
+    if data is None:
+        if z.getinfo(member).file_size > _MEMBER_CACHE_MAX_ITEM:
+            with z.open(member) as src, open(out_file, 'wb') as dst:
+                shutil.copyfileobj(src, dst, length=_BUFSIZE)
+            return
+        data = z.read(member)
+        _put_cached_member(key, data)
+
+    with open(out_file, 'wb') as f:
+        f.write(data)
+
+
+def _media_ext(member: str) -> str:
+    """返回zip成员的小写扩展名（不含点）"""
+    return member.rsplit('.', 1)[-1].lower()
+
+
+def _get_media_index(xlsx_path: str, z: Optional[zipfile.ZipFile] = None) -> List[str]:
     """
-    从 openpyxl 工作表对象里提取所有 DISPIMG 的图片 ID。
+    获取 xl/media/ 下所有图片的内部路径列表（按zip中顺序），按 (路径, 修改时间) 缓存
+    """
+    cache_key = (xlsx_path, os.path.getmtime(xlsx_path))
+    if cache_key not in _media_index_cache:
+        if z is not None:
+            names = z.namelist()
+        else:
+            with zipfile.ZipFile(xlsx_path, 'r') as own_z:
+                names = own_z.namelist()
+        _media_index_cache[cache_key] = [
+            name for name in names
+            if name.startswith('xl/media/') and _media_ext(name) in _IMG_EXTS
+        ]
+    return _media_index_cache[cache_key]
+
+
+def _extract_members_parallel(z: zipfile.ZipFile, tasks: List[Tuple[str, str]]) -> List[str]:
+    """
+    使用线程池并行提取多个zip成员（zlib解压与磁盘写入都会释放GIL）
+    所有线程共用同一个已打开的 ZipFile：读模式下成员经带锁的共享文件对象读取，并发 open/read 是安全的，
+    中央目录只解析一次
+    tasks 为 [(zip内部路径, 输出文件路径)]，返回已保存图片的绝对路径列表
+    """
+    if not tasks:
+        return []
+
+    def extract_one(task: Tuple[str, str]) -> str:
+        member, out_file = task
+        _copy_zip_member(z, member, out_file)
+        return os.path.abspath(out_file)
+
+    workers = max(1, min(EXTRACT_WORKERS, len(tasks)))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(extract_one, tasks))
+
+
+def _save_ids(ids: Iterable[str],
+              xlsx_path: str,
+              output_dir: str,
+              z: Optional[zipfile.ZipFile] = None,
+              id_to_path: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    按图片ID批量保存DISPIMG图片（去重、创建目录、并行提取）。
+    多个ID引用同一内部图片时只解压一次，其余ID的输出文件直接复制。
+    返回已保存图片的绝对路径列表。
+    """
+    if z is None:
+        # 整个批次只打开一次文件，ID映射与并行提取共用
+        with zipfile.ZipFile(xlsx_path, 'r') as own_z:
+            return _save_ids(ids, xlsx_path, output_dir, z=own_z, id_to_path=id_to_path)
+    if id_to_path is None:
+        id_to_path = _build_id_to_image_map(xlsx_path, z=z)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # {zip内部路径: [输出文件路径]}，同一图片的多个ID归为一组
+    member_to_outs: Dict[str, List[str]] = {}
+    seen = set()
+    for img_id in ids:
+        if img_id in seen or img_id not in id_to_path:
+            continue
+        seen.add(img_id)
+        member = 'xl/' + id_to_path[img_id]
+        member_to_outs.setdefault(member, []).append(os.path.join(output_dir, f"{img_id}.png"))
+
+    tasks = [(member, outs[0]) for member, outs in member_to_outs.items()]
+    saved = _extract_members_parallel(z, tasks)
+
+    for outs in member_to_outs.values():
+        for out_file in outs[1:]:
+            shutil.copyfile(outs[0], out_file)
+            saved.append(os.path.abspath(out_file))
+    return saved
+
+
+def _iter_dispimg_ids(ws: openpyxl.worksheet.worksheet.Worksheet,
+                      target_col: Optional[str] = None) -> Iterator[str]:
+    """
+    从 openpyxl 工作表对象里逐个产出所有 DISPIMG 的图片 ID（生成器）。
     如果指定了 target_col（如 'A'），则只扫描该列。
     """
+    if target_col:
+        # 只迭代目标列，且只取值，不构造Cell对象
+        col_idx = openpyxl.utils.column_index_from_string(target_col)
+        rows = ws.iter_rows(min_col=col_idx, max_col=col_idx, values_only=True)
+    else:
+        rows = ws.iter_rows(values_only=True)
+
+    # 列筛选已在 iter_rows 中完成，这里用 chain 在C层展平，内层循环无需任何分支判断
+    for value in chain.from_iterable(rows):
+        if not value or not isinstance(value, str):
+            continue
+        # 先做廉价的子串判断，绝大多数单元格不含公式，无需进入正则
+        if 'DISPIMG' not in value:
+            continue
+        match = _DISPIMG_RE.search(value)
+        if match:
+            yield match.group(1)
+
+
+def _resolve_part(base_part: str, target: str) -> str:
+    """
+    将 rels 中的 Target 解析为zip内部路径
+    Target 可能是相对 base_part 所在目录的路径，也可能是以 / 开头的绝对路径
+    """
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_part), target))
+
+
+def _read_part_rels(z: zipfile.ZipFile, part: str) -> Dict[str, Tuple[str, str]]:
+    """
+    读取某个部件的 .rels 文件，返回 {rId -> (关系类型, zip内部路径)}；没有rels时返回空字典
+    """
+    rels_part = posixpath.join(posixpath.dirname(part), '_rels', posixpath.basename(part) + '.rels')
+    try:
+        rels_root = ET.fromstring(z.read(rels_part))
+    except KeyError:
+        return {}
+    return {
+        rel.attrib['Id']: (rel.attrib.get('Type', ''), _resolve_part(part, rel.attrib['Target']))
+        for rel in rels_root.iter(_RELATIONSHIP_Q)
+    }
+
+
+def _get_sheet_parts(z: zipfile.ZipFile) -> Dict[str, str]:
+    """
+    读取 workbook.xml 及其 rels，返回 {工作表名 -> zip内部路径}，顺序与工作簿一致
+    """
+    wb_root = ET.fromstring(z.read('xl/workbook.xml'))
+    rels = _read_part_rels(z, 'xl/workbook.xml')
+
+    sheet_parts = {}
+    for sheet in wb_root.iter(_SHEET_Q):
+        rel = rels.get(sheet.attrib.get(_RID_ATTR))
+        if rel:
+            sheet_parts[sheet.attrib['name']] = rel[1]
+    return sheet_parts
+
+
+def _anchor_from_position(anchor) -> Optional[Tuple[int, int]]:
+    """从 oneCellAnchor / twoCellAnchor 的 <xdr:from> 读取 (row, col)，转换为1基索引"""
+    anchor_from = anchor.find(_FROM_Q)
+    if anchor_from is None:
+        return None
+    return int(anchor_from.findtext(_ANCHOR_ROW_Q)) + 1, int(anchor_from.findtext(_ANCHOR_COL_Q)) + 1
+
+
+# 按锚点标签分派位置解析函数；absoluteAnchor 不与单元格关联，不在表中即被跳过
+_ANCHOR_EXTRACTORS = {
+    _ONE_CELL_ANCHOR_Q: _anchor_from_position,
+    _TWO_CELL_ANCHOR_Q: _anchor_from_position,
+}
+
+
+def _parse_drawing_positions(z: zipfile.ZipFile, sheet_part: str) -> Dict[Tuple[int, int], str]:
+    """
+    解析工作表关联的 drawing*.xml，返回 {(row, col): 图片内部路径}（行列均为1基索引）
+    只读取锚点的 <xdr:from> 行列和 <a:blip r:embed>，不构造任何图片对象
+    """
+    position_map = {}
+
+    for rel_type, drawing_part in _read_part_rels(z, sheet_part).values():
+        if rel_type != _DRAWING_REL_TYPE:
+            continue
+        drawing_rels = _read_part_rels(z, drawing_part)
+
+        with z.open(drawing_part) as f:
+            for _, elem in ET.iterparse(f, events=('end',)):
+                extractor = _ANCHOR_EXTRACTORS.get(elem.tag)
+                if extractor is None:
+                    continue
+                position = extractor(elem)
+                blip = next(elem.iter(_BLIP_Q), None)
+                if position is not None and blip is not None:
+                    rel = drawing_rels.get(blip.get(_EMBED_ATTR))
+                    if rel:
+                        position_map[position] = rel[1]
+                # 已处理完的锚点及时清理，避免大量图片时占用内存
+                elem.clear()
+    return position_map
+
+
+def _scan_dispimg_ids_fast(xlsx_path: str,
+                           sheet_filter: Optional[str] = None,
+                           col_filter: Optional[str] = None) -> List[str]:
+    """
+    不加载openpyxl工作簿，直接流式扫描 sheet*.xml 中的 <f>_xlfn.DISPIMG(...)</f> 公式提取图片ID。
+    sheet_filter 指定工作表名（不存在时抛出 KeyError），col_filter 指定列字母（如 'A'）。
+    """
     ids = []
-    col_idx = openpyxl.utils.column_index_from_string(target_col) if target_col else None
+    # 目标列序号（从1开始）；单元格的 r 属性是可选的，缺失时按其在行内的位置推算列号
+    target_col = openpyxl.utils.column_index_from_string(col_filter.upper()) if col_filter else None
 
-    for row in ws.iter_rows(values_only=False):
-        for cell in row:
-            if target_col and cell.column != col_idx:
-                continue
-            value = str(cell.value or "")
-            if '=_xlfn.DISPIMG(' in value:
-                start = value.find('"') + 1
-                end = value.find('"', start)
-                ids.append(value[start:end])
+    with zipfile.ZipFile(xlsx_path, 'r') as z:
+        sheet_parts = _get_sheet_parts(z)
+        if sheet_filter is not None:
+            if sheet_filter not in sheet_parts:
+                raise KeyError(f"Worksheet {sheet_filter} does not exist.")
+            sheet_parts = {sheet_filter: sheet_parts[sheet_filter]}
+
+        for part in sheet_parts.values():
+            with z.open(part) as f:
+                # 只处理 'end' 事件：单元格结束时其 <f> 子元素已完整，
+                # 仅在公式含DISPIMG时才解析单元格地址做列过滤
+                col_idx = 0  # 当前行中上一个单元格的列号
+                for _, elem in ET.iterparse(f, events=('end',)):
+                    if elem.tag == _CELL_Q:
+                        if target_col is not None:
+                            # 单元格地址如 'B12'，去掉行号得到列字母；没有地址时为上一单元格的下一列
+                            ref = elem.get('r')
+                            if ref:
+                                col_idx = openpyxl.utils.column_index_from_string(ref.rstrip('0123456789'))
+                            else:
+                                col_idx += 1
+                        text = elem.findtext(_FORMULA_Q)
+                        if not text or 'DISPIMG' not in text:
+                            continue
+                        if target_col is not None and col_idx != target_col:
+                            continue
+                        match = _DISPIMG_RE.search(text)
+                        if match:
+                            ids.append(match.group(1))
+                    elif elem.tag == _ROW_Q:
+                        # 已处理完的行及时清理，避免大表占用内存
+                        elem.clear()
+                        col_idx = 0
     return ids
 
 
-def _build_id_to_image_map(xlsx_path: str) -> Dict[str, str]:
+def _collect_dispimg_ids(xlsx_path: str,
+                         sheet_name: Optional[str] = None,
+                         column: Optional[str] = None) -> List[str]:
     """
-    解析 .xlsx 内部结构，返回 {image_id -> image内部路径} 的映射（DISPIMG图片）
+    收集DISPIMG图片ID：优先直接扫描工作表XML，解析失败时回退到openpyxl
     """
     try:
-        with zipfile.ZipFile(xlsx_path, 'r') as z:
-            cellimages_xml = z.read('xl/cellimages.xml')
-            rels_xml = z.read('xl/_rels/cellimages.xml.rels')
+        return _scan_dispimg_ids_fast(xlsx_path, sheet_filter=sheet_name, col_filter=column)
     except KeyError:
-        # 如果没有cellimages.xml，说明没有DISPIMG图片
-        return {}
+        raise
+    except Exception as e:
+        logger.warning("直接扫描工作表XML失败，回退到openpyxl: %s", e)
 
-    root = ET.fromstring(cellimages_xml)
-    root_rels = ET.fromstring(rels_xml)
+    wb = _get_cached_workbook(xlsx_path)
+    if sheet_name is None:
+        all_ids = []
+        for ws in wb.worksheets:
+            all_ids.extend(_iter_dispimg_ids(ws, target_col=column))
+        return all_ids
+    return list(_iter_dispimg_ids(wb[sheet_name], target_col=column))
 
-    namespaces = {
-        'xdr': 'http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing',
-        'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
-        'r': 'http://schemas.openxmlformats.org/package/2006/relationships'
-    }
 
-    # 1. name -> rid
-    name_to_rid = {}
-    for pic in root.findall('.//xdr:pic', namespaces):
-        name = pic.find('.//xdr:cNvPr', namespaces).attrib['name']
-        rid = pic.find('.//a:blip', namespaces).attrib[
-            '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed']
-        name_to_rid[name] = rid
+def _build_id_to_image_map(xlsx_path: str,
+                           z: Optional[zipfile.ZipFile] = None) -> Dict[str, str]:
+    """
+    解析 .xlsx 内部结构，返回 {image_id -> image内部路径} 的映射（DISPIMG图片）
+    结果按 (路径, 修改时间) 缓存，同一文件只解析一次
+    调用方已打开zip时可传入 z，避免重复解析zip目录
+    """
+    cache_key = (xlsx_path, os.path.getmtime(xlsx_path))
+    if cache_key not in _id_map_cache:
+        if z is not None:
+            _id_map_cache[cache_key] = _parse_id_to_image_map(z)
+        else:
+            with zipfile.ZipFile(xlsx_path, 'r') as own_z:
+                _id_map_cache[cache_key] = _parse_id_to_image_map(own_z)
+    return _id_map_cache[cache_key]
+
 
-    # 2. rid -> 内部路径
+def _parse_id_to_image_map(z: zipfile.ZipFile) -> Dict[str, str]:
+    """
+    实际解析 cellimages.xml 及其 rels，构建 {image_id -> image内部路径} 映射
+    使用 iterparse 流式解析，每处理完一个图片节点即清理，内存占用与图片数量无关
+    """
+    name_to_rid = {}
     rid_to_path = {}
-    for rel in root_rels.findall('.//r:Relationship', namespaces):
-        rid_to_path[rel.attrib['Id']] = rel.attrib['Target']
+    try:
+        # 1. name -> rid
+        with z.open('xl/cellimages.xml') as f:
+            for _, elem in ET.iterparse(f, events=('end',)):
+                if elem.tag != _PIC_Q:
+                    continue
+                cnvpr = next(elem.iter(_CNVPR_Q), None)
+                blip = next(elem.iter(_BLIP_Q), None)
+                if cnvpr is not None and blip is not None:
+                    name_to_rid[cnvpr.get('name')] = blip.get(_EMBED_ATTR)
+                elem.clear()
+
+        # 2. rid -> 内部路径
+        with z.open('xl/_rels/cellimages.xml.rels') as f:
+            for _, elem in ET.iterparse(f, events=('end',)):
+                if elem.tag == _RELATIONSHIP_Q:
+                    rid_to_path[elem.get('Id')] = elem.get('Target')
+                    elem.clear()
+    except KeyError:
+        # 如果没有cellimages.xml，说明没有DISPIMG图片
+        return {}
 
     return {name: rid_to_path[rid] for name, rid in name_to_rid.items() if rid in rid_to_path}
 
@@ -181,13 +539,8 @@ def _extract_floating_images(xlsx_path: str) -> List[str]:
     floating_images = []
     
     try:
-        with zipfile.ZipFile(xlsx_path, 'r') as z:
-            # 检查xl/media目录中的图片文件
-            for file_info in z.filelist:
-                if file_info.filename.startswith('xl/media/') and not file_info.is_dir():
-                    # 提取文件名（不包含路径）
-                    image_filename = os.path.basename(file_info.filename)
-                    floating_images.append(image_filename)
+        # 检查xl/media目录中的图片文件，只保留文件名（不包含路径）
+        floating_images = [os.path.basename(name) for name in _get_media_index(xlsx_path)]
     except Exception:
         # 如果没有xl/media目录或其他错误，返回空列表
         pass
@@ -195,51 +548,6 @@ def _extract_floating_images(xlsx_path: str) -> List[str]:
     return floating_images
 
 
-def _get_cell_floating_image(xlsx_path: str, sheet_name: str, cell_address: str) -> Optional[str]:
-    """
-    获取指定单元格位置的浮动图片
-    通过分析drawings.xml来确定图片与单元格的位置关系
-    """
-    try:
-        wb = openpyxl.load_workbook(xlsx_path, data_only=False)
-        if sheet_name not in wb.sheetnames:
-            return None
-        
-        ws = wb[sheet_name]
-        
-        # 获取单元格的行列信息
-        cell = ws[cell_address]
-        target_row = cell.row
-        target_col = cell.column
-        
-        # 检查工作表是否有图片
-        if hasattr(ws, '_images') and ws._images:
-            # 遍历工作表中的图片
-            for img in ws._images:
-                if hasattr(img, 'anchor') and hasattr(img.anchor, '_from'):
-                    # 获取图片锚点信息
-                    anchor_from = img.anchor._from
-                    if hasattr(anchor_from, 'row') and hasattr(anchor_from, 'col'):
-                        # 检查图片是否在目标单元格附近（允许一定的偏差）
-                        img_row = anchor_from.row + 1  # openpyxl使用0基索引
-                        img_col = anchor_from.col + 1
-                        
-                        # 如果图片位置与目标单元格精确匹配（0偏差）
-                        if img_row == target_row and img_col == target_col:
-                            # 尝试从图片对象中获取文件名
-                            if hasattr(img, '_id') or hasattr(img, 'path'):
-                                # 这里需要进一步解析来获取实际的图片文件名
-                                # 由于openpyxl的限制，我们使用备用方案
-                                pass
-        
-        wb.close()
-        
-    except Exception:
-        pass
-    
-    return None
-
-
 # ----------------------------------------------------------
 # 对外 API
 # ----------------------------------------------------------
@@ -249,25 +557,8 @@ def extract_workbook_images(xlsx_path: str,
     提取整个工作簿里所有 DISPIMG 图片。
     返回已保存图片的绝对路径列表。
     """
-    wb = openpyxl.load_workbook(xlsx_path, data_only=False)
-    all_ids = []
-    for ws in wb.worksheets:
-        all_ids.extend(_extract_dispimg_ids(ws))
-
-    id_to_path = _build_id_to_image_map(xlsx_path)
-    os.makedirs(output_dir, exist_ok=True)
-
-    saved = []
-    with zipfile.ZipFile(xlsx_path, 'r') as z:
-        for img_id in set(all_ids):
-            if img_id in id_to_path:
-                img_internal = 'xl/' + id_to_path[img_id]
-                img_data = z.read(img_internal)
-                out_file = os.path.join(output_dir, f"{img_id}.png")
-                with open(out_file, 'wb') as f:
-                    f.write(img_data)
-                saved.append(os.path.abspath(out_file))
-    return saved
+    all_ids = _collect_dispimg_ids(xlsx_path)
+    return _save_ids(all_ids, xlsx_path, output_dir)
 
 
 def extract_sheet_images(xlsx_path: str,
@@ -276,24 +567,8 @@ def extract_sheet_images(xlsx_path: str,
     """
     仅提取指定工作表中的 DISPIMG 图片。
     """
-    wb = openpyxl.load_workbook(xlsx_path, data_only=False)
-    ws = wb[sheet_name]
-    ids = _extract_dispimg_ids(ws)
-
-    id_to_path = _build_id_to_image_map(xlsx_path)
-    os.makedirs(output_dir, exist_ok=True)
-
-    saved = []
-    with zipfile.ZipFile(xlsx_path, 'r') as z:
-        for img_id in set(ids):
-            if img_id in id_to_path:
-                img_internal = 'xl/' + id_to_path[img_id]
-                img_data = z.read(img_internal)
-                out_file = os.path.join(output_dir, f"{img_id}.png")
-                with open(out_file, 'wb') as f:
-                    f.write(img_data)
-                saved.append(os.path.abspath(out_file))
-    return saved
+    ids = _collect_dispimg_ids(xlsx_path, sheet_name)
+    return _save_ids(ids, xlsx_path, output_dir)
 
 
 def extract_column_images(xlsx_path: str,
@@ -303,24 +578,8 @@ def extract_column_images(xlsx_path: str,
     """
     仅提取指定工作表某一列中的 DISPIMG 图片。
     """
-    wb = openpyxl.load_workbook(xlsx_path, data_only=False)
-    ws = wb[sheet_name]
-    ids = _extract_dispimg_ids(ws, target_col=column)
-
-    id_to_path = _build_id_to_image_map(xlsx_path)
-    os.makedirs(output_dir, exist_ok=True)
-
-    saved = []
-    with zipfile.ZipFile(xlsx_path, 'r') as z:
-        for img_id in set(ids):
-            if img_id in id_to_path:
-                img_internal = 'xl/' + id_to_path[img_id]
-                img_data = z.read(img_internal)
-                out_file = os.path.join(output_dir, f"{img_id}.png")
-                with open(out_file, 'wb') as f:
-                    f.write(img_data)
-                saved.append(os.path.abspath(out_file))
-    return saved
+    ids = _collect_dispimg_ids(xlsx_path, sheet_name, column)
+    return _save_ids(ids, xlsx_path, output_dir)
 
 
 def extract_floating_images_from_sheet(xlsx_path: str,
@@ -336,34 +595,26 @@ def extract_floating_images_from_sheet(xlsx_path: str,
     try:
         with zipfile.ZipFile(xlsx_path, 'r') as z:
             # 获取所有xl/media目录中的图片
-            media_files = []
-            for file_info in z.filelist:
-                if file_info.filename.startswith('xl/media/') and not file_info.is_dir():
-                    # 检查是否是图片文件
-                    ext = os.path.splitext(file_info.filename)[1].lower()
-                    if ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp']:
-                        media_files.append(file_info.filename)
+            media_files = _get_media_index(xlsx_path, z=z)
             
             # 提取每个图片文件
             for i, media_file in enumerate(media_files):
                 try:
-                    img_data = z.read(media_file)
                     # 获取文件扩展名
                     file_ext = os.path.splitext(media_file)[1] or '.png'
                     # 使用原始文件名作为输出文件名
                     original_name = os.path.basename(media_file)
                     out_file = os.path.join(output_dir, f"floating_{i+1}_{original_name}")
                     
-                    with open(out_file, 'wb') as f:
-                        f.write(img_data)
+                    _copy_zip_member(z, media_file, out_file)
                     saved_images.append(os.path.abspath(out_file))
-                    print(f"成功提取浮动图片: {out_file}")
+                    logger.debug("成功提取浮动图片: %s", out_file)
                 except Exception as e:
-                    print(f"提取图片 {media_file} 时出错: {e}")
+                    logger.error("提取图片 %s 时出错: %s", media_file, e)
                     continue
                     
     except Exception as e:
-        print(f"提取浮动图片时出错: {e}")
+        logger.error("提取浮动图片时出错: %s", e)
         pass
     
     return saved_images
@@ -378,33 +629,58 @@ def extract_first_available_image(xlsx_path: str,
     """
     os.makedirs(output_dir, exist_ok=True)
     
-    # 1. 先尝试DISPIMG图片
-    try:
-        dispimg_ids = get_all_image_ids(xlsx_path)
-        if dispimg_ids:
-            return extract_image_by_id(xlsx_path, dispimg_ids[0], output_dir)
-    except Exception:
-        pass
-    
-    # 2. 再尝试浮动图片
     try:
         with zipfile.ZipFile(xlsx_path, 'r') as z:
-            for file_info in z.filelist:
-                if file_info.filename.startswith('xl/media/') and not file_info.is_dir():
-                    ext = os.path.splitext(file_info.filename)[1].lower()
-                    if ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp']:
-                        img_data = z.read(file_info.filename)
-                        out_file = os.path.join(output_dir, f"{prefix}{ext}")
-                        
-                        with open(out_file, 'wb') as f:
-                            f.write(img_data)
-                        return os.path.abspath(out_file)
+            # 1. 先尝试DISPIMG图片：只流式读取到第一个可解析的图片即停止
+            try:
+                first_dispimg = _find_first_dispimg(z)
+                if first_dispimg:
+                    image_id, img_internal = first_dispimg
+                    out_file = os.path.join(output_dir, f"{image_id}.png")
+                    _copy_zip_member(z, img_internal, out_file)
+                    return os.path.abspath(out_file)
+            except Exception:
+                pass
+            
+            # 2. 再尝试浮动图片
+            for media_file in _get_media_index(xlsx_path, z=z):
+                ext = _media_ext(media_file)
+                if ext in _COMMON_IMG_EXTS:
+                    out_file = os.path.join(output_dir, f"{prefix}.{ext}")
+                    
+                    _copy_zip_member(z, media_file, out_file)
+                    return os.path.abspath(out_file)
     except Exception:
         pass
     
     return None
 
 
+def _find_first_dispimg(z: zipfile.ZipFile) -> Optional[Tuple[str, str]]:
+    """
+    流式解析 cellimages.xml，返回第一个能解析到内部路径的 (图片ID, zip内部路径)
+    不构建完整的ID映射；没有DISPIMG图片时返回None
+    """
+    try:
+        z.getinfo('xl/cellimages.xml')
+    except KeyError:
+        return None
+    rels = _read_part_rels(z, 'xl/cellimages.xml')
+
+    with z.open('xl/cellimages.xml') as f:
+        for _, elem in ET.iterparse(f, events=('end',)):
+            if elem.tag != _PIC_Q:
+                continue
+            cnvpr = next(elem.iter(_CNVPR_Q), None)
+            blip = next(elem.iter(_BLIP_Q), None)
+            if cnvpr is not None and blip is not None:
+                rel = rels.get(blip.get(_EMBED_ATTR))
+                if rel:
+                    return cnvpr.get('name'), rel[1]
+            elem.clear()
+    return None
+
+
 def extract_image_by_id(xlsx_path: str,
                         image_id: str,
                         output_dir: str = 'images') -> Optional[str]:
@@ -412,22 +688,41 @@ def extract_image_by_id(xlsx_path: str,
     通过指定的图片ID直接提取图片（DISPIMG格式）。
     返回保存的图片绝对路径，如果图片ID不存在则返回None。
     """
-    id_to_path = _build_id_to_image_map(xlsx_path)
-    
-    if image_id not in id_to_path:
-        return None
-    
-    os.makedirs(output_dir, exist_ok=True)
-    
     with zipfile.ZipFile(xlsx_path, 'r') as z:
+        id_to_path = _build_id_to_image_map(xlsx_path, z=z)
+        
+        if image_id not in id_to_path:
+            return None
+        
+        os.makedirs(output_dir, exist_ok=True)
+        
         img_internal = 'xl/' + id_to_path[image_id]
-        img_data = z.read(img_internal)
         out_file = os.path.join(output_dir, f"{image_id}.png")
-        with open(out_file, 'wb') as f:
-            f.write(img_data)
+        _copy_zip_member(z, img_internal, out_file)
         return os.path.abspath(out_file)
 
 
+def extract_images_by_ids(xlsx_path: str,
+                          image_ids: Iterable[str],
+                          output_dir: str = 'images') -> Dict[str, Optional[str]]:
+    """
+    批量按图片ID提取图片（DISPIMG格式），整个文件只打开、解析一次。
+    返回 {image_id -> 保存的图片绝对路径}，文件中不存在的ID对应None。
+    """
+    image_ids = list(dict.fromkeys(image_ids))
+    result: Dict[str, Optional[str]] = dict.fromkeys(image_ids)
+    if not image_ids:
+        return result
+    
+    with zipfile.ZipFile(xlsx_path, 'r') as z:
+        id_to_path = _build_id_to_image_map(xlsx_path, z=z)
+        found = [img_id for img_id in image_ids if img_id in id_to_path]
+        _save_ids(found, xlsx_path, output_dir, z=z, id_to_path=id_to_path)
+    for img_id in found:
+        result[img_id] = os.path.abspath(os.path.join(output_dir, f"{img_id}.png"))
+    return result
+
+
 def extract_image_from_cell(xlsx_path: str,
                            sheet_name: str,
                            cell_address: str,
@@ -445,134 +740,89 @@ def extract_image_from_cell(xlsx_path: str,
         提取的图片文件路径，如果没有找到图片则返回None
     """
     try:
+        os.makedirs(output_dir, exist_ok=True)
+        
         # 使用缓存的工作簿
         wb = _get_cached_workbook(xlsx_path)
         
         if sheet_name not in wb.sheetnames:
-            print(f"工作表 '{sheet_name}' 不存在")
+            logger.warning("工作表 '%s' 不存在", sheet_name)
             return None
         
         ws = wb[sheet_name]
-        cell = ws[cell_address]
         
         # 首先尝试提取DISPIMG格式的图片
-        # 从单元格地址中提取列字母（如从'N4'提取'N'）
-        cell_column = openpyxl.utils.get_column_letter(cell.column)
-        dispimg_ids = _extract_dispimg_ids(ws, cell_column)
-        if dispimg_ids:
-            print(f"在单元格 {cell_address} 找到DISPIMG图片: {dispimg_ids}")
-            for img_id in dispimg_ids:
-                result = extract_image_by_id(xlsx_path, img_id, output_dir)
-                if result:
-                    return result
+        # 从单元格地址中提取列字母和行号（如从'N4'提取'N'和4）
+        cell_column, cell_row = openpyxl.utils.cell.coordinate_from_string(cell_address)
+        cell_col_idx = openpyxl.utils.column_index_from_string(cell_column)
+        for img_id in _iter_dispimg_ids(ws, cell_column):
+            logger.debug("在单元格 %s 找到DISPIMG图片: %s", cell_address, img_id)
+            result = extract_image_by_id(xlsx_path, img_id, output_dir)
+            if result:
+                return result
         
         # 如果没有DISPIMG，尝试提取浮动图片（使用优化的缓存方法）
-        print(f"在单元格 {cell_address} 未找到DISPIMG，尝试浮动图片...")
-        result = _extract_floating_image_from_cell(xlsx_path, ws, cell.row, cell.column, output_dir)
+        logger.debug("在单元格 %s 未找到DISPIMG，尝试浮动图片...", cell_address)
+        result = _extract_floating_image_from_cell(xlsx_path, sheet_name, cell_row, cell_col_idx, output_dir)
         if result:
             return result
         
-        print(f"在单元格 {cell_address} 未找到任何图片")
+        logger.debug("在单元格 %s 未找到任何图片", cell_address)
         return None
         
     except Exception as e:
-        print(f"提取图片时出错: {e}")
+        logger.error("提取图片时出错: %s", e)
         return None
 
 
-def _extract_floating_image_from_cell(xlsx_path: str, ws, target_row: int, target_col: int, output_dir: str) -> Optional[str]:
+def _extract_floating_image_from_cell(xlsx_path: str, sheet_name: str, target_row: int, target_col: int, output_dir: str) -> Optional[str]:
     """
     从指定单元格位置提取浮动图片的内部方法（优化版本，使用缓存）
+    调用方负责确保 output_dir 已存在
     """
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # 获取工作表名称
-    sheet_name = ws.title
-    
     # 使用缓存快速查找图片位置
     position_map = _build_image_position_cache(xlsx_path, sheet_name)
     
-    print(f"快速查找: 目标位置({target_row}, {target_col})")
+    logger.debug("快速查找: 目标位置(%d, %d)", target_row, target_col)
     
     # 直接查找精确匹配的图片
     if (target_row, target_col) in position_map:
-        image_index = position_map[(target_row, target_col)]
-        print(f"快速匹配: 在位置({target_row}, {target_col})找到图片{image_index}")
+        media_file = position_map[(target_row, target_col)]
+        logger.debug("快速匹配: 在位置(%d, %d)找到图片%s", target_row, target_col, media_file)
         
-        # 获取图片对象并提取
-        if hasattr(ws, '_images') and ws._images and image_index < len(ws._images):
-            img = ws._images[image_index]
-            return _extract_image_from_openpyxl_object(img, image_index, output_dir)
-    
-    print(f"快速查找: 位置({target_row}, {target_col})没有找到精确匹配的图片")
-    return None
-    
-    # 如果无法精确定位图片位置，不提取任何图片
-    # 这样可以避免提取不相关的图片
+        try:
+            out_file = os.path.join(output_dir, f"matched_{posixpath.basename(media_file)}")
+            with zipfile.ZipFile(xlsx_path, 'r') as z:
+                _copy_zip_member(z, media_file, out_file)
+            return os.path.abspath(out_file)
+        except Exception as e:
+            logger.error("提取浮动图片 %s 失败: %s", media_file, e)
+            return None
     
+    logger.debug("快速查找: 位置(%d, %d)没有找到精确匹配的图片", target_row, target_col)
+    # 如果无法精确定位图片位置，不提取任何图片，避免提取不相关的图片
     return None
 
 
-def _extract_image_from_openpyxl_object(img, image_index: int, output_dir: str) -> Optional[str]:
-    """
-    从openpyxl图片对象中提取图片数据
-    """
-    try:
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # 尝试获取图片数据
-        if hasattr(img, '_data'):
-            img_data = img._data()
-        elif hasattr(img, 'ref'):
-            # 有些版本的openpyxl使用ref属性
-            img_data = img.ref
-        else:
-            print(f"调试: 无法从图片对象获取数据，图片属性: {dir(img)}")
-            return None
-        
-        # 确定文件扩展名
-        file_ext = '.png'  # 默认扩展名
-        if hasattr(img, 'format') and img.format:
-            file_ext = f'.{img.format.lower()}'
-        
-        out_file = os.path.join(output_dir, f"matched_image_{image_index+1}{file_ext}")
-        
-        with open(out_file, 'wb') as f:
-            f.write(img_data)
-        
-        print(f"调试: 成功提取图片到 {out_file}")
-        return os.path.abspath(out_file)
-        
-    except Exception as e:
-        print(f"调试: 从openpyxl对象提取图片失败: {e}")
-        return None
-
-
 def _extract_specific_floating_image(xlsx_path: str, image_index: int, output_dir: str) -> Optional[str]:
     """
     提取指定索引的浮动图片
     """
     try:
         with zipfile.ZipFile(xlsx_path, 'r') as z:
-            media_files = []
-            for file_info in z.filelist:
-                if file_info.filename.startswith('xl/media/') and not file_info.is_dir():
-                    ext = os.path.splitext(file_info.filename)[1].lower()
-                    if ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp']:
-                        media_files.append(file_info.filename)
+            media_files = [name for name in _get_media_index(xlsx_path, z=z)
+                           if _media_ext(name) in _COMMON_IMG_EXTS]
             
             if image_index < len(media_files):
                 media_file = media_files[image_index]
-                img_data = z.read(media_file)
                 file_ext = os.path.splitext(media_file)[1] or '.png'
                 out_file = os.path.join(output_dir, f"floating_image_{image_index+1}{file_ext}")
                 
-                with open(out_file, 'wb') as f:
-                    f.write(img_data)
+                _copy_zip_member(z, media_file, out_file)
                 return os.path.abspath(out_file)
             
     except Exception as e:
-        print(f"提取特定浮动图片失败: {e}")
+        logger.error("提取特定浮动图片失败: %s", e)
         pass
     
     return None
@@ -1,21 +1,343 @@
-import pandas as pd
 import fitz  # PyMuPDF
+import openpyxl
 import os
 import re
 import json
 import logging
+import queue
+import struct
+import zlib
+import multiprocessing
+import atexit
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
-from datetime import datetime
-from PIL import Image
-from pptx import Presentation
-from pptx.util import Inches
+from datetime import date, datetime, time
 import CatchExcelImageTool
 
+try:
+    # 可选：Rust实现的xlsx解析，安装后读取大表格快得多
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+try:
+    # 可选：C实现的JSON解析/序列化，加载和保存预设时使用
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# 字段映射类型（预编译字段映射时使用）
+_FIELD_TEXT_COLS = "text_cols"  # Excel列（可多列，用分隔符拼接）
+_FIELD_IMAGE_COL = "image_col"  # Excel列-图片
+_FIELD_CUSTOM = "custom"  # 自定义值
+
+# 常用正则
+_DISPIMG_RE = re.compile(r'=(?:_xlfn\.)?DISPIMG\("([^"]+)"')  # =DISPIMG("ID_xxx",1) 或 =_xlfn.DISPIMG("ID_xxx",1)
+_CHINESE_RE = re.compile(r'[\u4e00-\u9fff\u3400-\u4dbf\uf900-\ufaff]')  # 中文字符的Unicode范围
+_INVALID_FN_CHARS_TRANS = str.maketrans(dict.fromkeys('<>:"/\\|?*', '_'))  # 文件名中的非法字符替换为'_'
+
+# 用户桌面路径（默认输出目录），只解析一次
+_DESKTOP_PATH = str(Path.home() / "Desktop")
+
+
+def _env_int(name, default):
+    """读取整数环境变量；为空或不是数字时使用默认值，结果至少为1"""
+    try:
+        value = int(os.environ.get(name, '').strip() or default)
+    except ValueError:
+        value = default
+    return max(1, value)
+
+
+# 并行填充PDF/转换PNG的进程数，设为1则在当前进程中逐个处理
+FILL_WORKERS = _env_int('FILL_WORKERS', os.cpu_count() or 1)
+
+# 任务数达到该值才启动进程池：Windows（spawn、打包后的exe）下启动进程池的开销比逐个处理几行还大
+PARALLEL_MIN_TASKS = _env_int('PARALLEL_MIN_TASKS', 8)
+
+# 循环中的成功日志攒够多少条后一次发送到GUI
+GUI_LOG_BATCH_SIZE = 50
+
+# 后台写日志文件的监听线程（整个进程只保留一个）
+_log_listener = None
+
+
+def _stop_log_listener():
+    """停止日志监听线程，写出队列中剩余的日志"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+atexit.register(_stop_log_listener)
+
+# PPT幻灯片和页面图片的位置尺寸（EMU，1英寸=914400），即 Inches(x) 的值
+_EMU_PER_INCH = 914400
+_SLIDE_WIDTH, _SLIDE_HEIGHT = 10 * _EMU_PER_INCH, int(7.5 * _EMU_PER_INCH)
+_PICTURE_LEFT = _PICTURE_TOP = int(0.5 * _EMU_PER_INCH)
+_PICTURE_BOX_INCHES = (9, 6.5)
+_PICTURE_WIDTH, _PICTURE_HEIGHT = (int(v * _EMU_PER_INCH) for v in _PICTURE_BOX_INCHES)
+
+# 渲染像素数超过该值的页面分块渲染，限制单次像素缓冲区大小
+TILE_RENDER_PIXELS = 64_000_000
+
+# 栅格化扁平化时每渲染多少页清空一次MuPDF资源缓存
+RASTER_STORE_SHRINK_PAGES = 8
+
+# 子进程处理器需要从主进程复制的配置（fill_pdf_form 及其调用的方法会读取这些属性）
+_FILL_WORKER_SETTINGS = (
+    "font_base_path", "default_font", "chinese_font", "default_fonts", "chinese_fonts",
+    "raster_flatten_dpi", "render_colorspace",
+)
+
+# 子进程中复用的处理器和模板（由 _init_fill_worker 初始化）
+_worker_processor = None
+_worker_template = None
+# 子进程中当前任务发往GUI的日志，随任务结果返回主进程再发送
+_worker_gui_logs = []
+
+
+def _collect_worker_gui_log(operation, level="info", message=""):
+    """子进程中的GUI日志回调：先记下，由主进程转发到GUI"""
+    _worker_gui_logs.append((operation, level, message))
+
+
+def _init_fill_worker(settings, template_bytes, widget_index, log_queue):
+    """
+    进程池初始化：每个子进程只创建一次处理器并接收一次模板字节
+    填充会修改文档，而PyMuPDF没有廉价的文档复制，所以每个任务仍从这份字节重新打开模板；
+    从内存打开只解析xref表，对象按需加载，开销远小于保存
+    日志经 log_queue 交给主进程写入文件，子进程不再各自打开日志文件
+    """
+    global _worker_processor, _worker_template
+    processor = ExcelToPDFProcessor(log_queue=log_queue)
+    for name, value in settings.items():
+        setattr(processor, name, value)
+    processor.gui_log_callback = _collect_worker_gui_log
+    _worker_processor = processor
+    _worker_template = (template_bytes, widget_index)
+
+
+def _fill_worker(task):
+    """子进程中填充单个PDF，返回 (任务序号, 是否成功, 消息, 待发送到GUI的日志)"""
+    index, output_pdf_path, data, image_data, flatten_form = task
+    template_bytes, widget_index = _worker_template
+    _worker_gui_logs.clear()
+    success, message = _worker_processor.fill_pdf_form(
+        None, output_pdf_path, data, image_data, flatten_form,
+        template_bytes=template_bytes, widget_index=widget_index
+    )
+    return index, success, message, list(_worker_gui_logs)
+
+
+@lru_cache(maxsize=2048)
+def _col_letter_to_index(col):
+    """将Excel列字母转为从0开始的列号，非法字符返回None（结果缓存，常用列只计算一次）"""
+    result = 0
+    for c in col:
+        if 'A' <= c <= 'Z':
+            result = result * 26 + (ord(c) - ord('A') + 1)
+        elif 'a' <= c <= 'z':
+            result = result * 26 + (ord(c) - ord('a') + 1)
+        else:
+            return None
+    return result - 1
+
+
+def _cell_text(row, col_idx):
+    """取行元组中某列的文本，列不存在或为空时返回""，字符串值不再经过str()"""
+    if col_idx is None or col_idx >= len(row):
+        return ""
+    val = row[col_idx]
+    if val is None:
+        return ""
+    return val if type(val) is str else str(val)
+
+
+def _bake_form_appearances(doc):
+    """
+    将控件和注释的外观流（复选框、边框、底色等）写入页面内容，之后复制页面内容即可保留它们
+    当前PyMuPDF版本没有 Document.bake 时返回False，由调用方改用整页渲染
+    """
+    bake = getattr(doc, "bake", None)
+    if bake is None:
+        return False
+    bake(annots=True, widgets=True)
+    return True
+
+
+def _render_colorspace(name):
+    """渲染颜色空间：'gray' 为灰度（每像素1字节），其余为RGB"""
+    return fitz.csGRAY if name == "gray" else fitz.csRGB
+
+
+def _encode_png(pix, compress_level=None):
+    """
+    将pixmap编码为PNG。PyMuPDF的PNG编码固定使用默认压缩级别，
+    指定 compress_level（0~9）时改用PIL编码，级别1比默认快数倍，文件只略大
+    """
+    if compress_level is None:
+        return pix.tobytes("png")
+    from PIL import Image
+    mode = "L" if pix.n == 1 else "RGB"
+    buf = BytesIO()
+    Image.frombytes(mode, (pix.width, pix.height), pix.samples).save(
+        buf, format="PNG", compress_level=compress_level, optimize=False)
+    return buf.getvalue()
+
+
+def _png_chunk(tag, data):
+    """PNG数据块：长度 + 类型 + 数据 + CRC"""
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+
+def _render_page_png_tiled(page, zoom, colorspace, compress_level=6, tile_px=2048):
+    """
+    分条渲染超大页面并流式编码为PNG：每次只渲染整页宽、tile_px 像素高的一条，
+    逐行压缩后即丢弃，像素缓冲区和未压缩数据都只有一条的大小（返回的压缩后PNG字节仍在内存中）
+    """
+    mat = fitz.Matrix(zoom, zoom)
+    full = page.rect.transform(mat).irect
+    cs = _render_colorspace(colorspace)
+    n = 1 if colorspace == "gray" else 3
+    row_len = full.width * n
+    
+    out = BytesIO()
+    out.write(b'\x89PNG\r\n\x1a\n')
+    out.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', full.width, full.height, 8, 0 if n == 1 else 2, 0, 0, 0)))
+    compressor = zlib.compressobj(compress_level)
+    
+    next_row = full.y0  # 下一条待写入的像素行（绝对坐标）
+    while next_row < full.y1:
+        # 从上一条末尾再往前一像素开始取，避免坐标取整在两条之间漏掉行；重叠的行直接跳过
+        clip = fitz.Rect(page.rect.x0, max(page.rect.y0, (next_row - 1) / zoom),
+                         page.rect.x1, min(page.rect.y1, (next_row + tile_px) / zoom))
+        pix = page.get_pixmap(matrix=mat, clip=clip, alpha=False, colorspace=cs)
+        samples, stride = pix.samples, pix.stride
+        # 该条与整页在水平方向上的偏移（正常为0）；条宽可能因取整与整页相差一像素，
+        # 每行最多只取本条一行的有效像素（stride 可能含行尾填充），缺少的像素用白色补齐，不会读到下一行
+        left = max(0, pix.x - full.x0) * n
+        skip = max(0, full.x0 - pix.x) * n
+        take = max(0, min(row_len - left, pix.width * n - skip))
+        rows = []
+        for y in range(max(next_row, pix.y), min(pix.y + pix.height, full.y1)):
+            offset = (y - pix.y) * stride + skip
+            row = b'\xff' * left + samples[offset:offset + take]
+            rows.append(b'\x00' + row + b'\xff' * (row_len - len(row)))  # 每行前的0为PNG滤波类型（不滤波）
+        pix = samples = None
+        if not rows:
+            # 取整导致没有取到新行时，剩余行以白色补齐，避免死循环
+            rows = [b'\x00' + b'\xff' * row_len] * (full.y1 - next_row)
+        next_row += len(rows)
+        data = compressor.compress(b''.join(rows))
+        if data:
+            out.write(_png_chunk(b'IDAT', data))
+    
+    out.write(_png_chunk(b'IDAT', compressor.flush()))
+    out.write(_png_chunk(b'IEND', b''))
+    return out.getvalue()
+
+
+def _render_page_png(page, zoom, colorspace, compress_level=None):
+    """渲染单页并编码为PNG，不需要透明通道；像素数超过 TILE_RENDER_PIXELS 的页面分条渲染、流式编码"""
+    if page.rect.width * page.rect.height * zoom * zoom > TILE_RENDER_PIXELS:
+        return _render_page_png_tiled(page, zoom, colorspace, 6 if compress_level is None else compress_level)
+    
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False,
+                          colorspace=_render_colorspace(colorspace))
+    data = _encode_png(pix, compress_level)
+    pix = None  # 编码后立即释放像素缓冲区
+    return data
+
+
+def _render_pdf_to_png(pdf_path, output_folder, zoom=2.0, colorspace="rgb", compress_level=None, all_pages=False):
+    """
+    将PDF渲染为PNG，返回第一页的PNG路径（不依赖处理器实例，可在子进程中执行）
+    默认只渲染第一页，all_pages=True 时其余页面另存为 {文件名}_p{页码}.png
+    """
+    pdf_name = Path(pdf_path).stem
+    png_path = os.path.join(output_folder, f"{pdf_name}.png")
+    
+    with fitz.open(pdf_path) as doc:
+        page_count = len(doc) if all_pages else 1
+        for page_num in range(page_count):
+            out_path = png_path if page_num == 0 else os.path.join(output_folder, f"{pdf_name}_p{page_num + 1}.png")
+            png_data = _render_page_png(doc[page_num], zoom, colorspace, compress_level)
+            with open(out_path, 'wb') as f:
+                f.write(png_data)
+    return png_path
+
+
+def _pdf_to_png_worker(task):
+    """子进程中转换单个PDF，返回 (PNG路径, 错误信息)"""
+    pdf_path, output_folder, zoom, colorspace, compress_level, all_pages = task
+    try:
+        return _render_pdf_to_png(pdf_path, output_folder, zoom, colorspace, compress_level, all_pages), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _ppt_zoom(page_rect, dpi, box_inches=_PICTURE_BOX_INCHES, max_pixels=150_000_000):
+    """
+    计算PPT用的缩放比例：按图片在幻灯片上的尺寸(英寸)和目标DPI算出刚好够用的像素，不多渲染
+    同时限制最大像素数为150M像素（约为PIL默认限制的85%），比例在0.5~2.0之间
+    """
+    return _ppt_zoom_for_size(page_rect.width, page_rect.height, dpi, box_inches, max_pixels)
+
+
+@lru_cache(maxsize=64)
+def _ppt_zoom_for_size(width, height, dpi, box_inches, max_pixels):
+    """按页面尺寸缓存缩放比例：同一模板生成的PDF页面尺寸相同，每个进程只计算一次"""
+    current_pixels = width * height
+    if current_pixels <= 0:
+        return 1.0
+    needed_zoom = max(box_inches[0] * dpi / width, box_inches[1] * dpi / height)
+    max_zoom = (max_pixels / current_pixels) ** 0.5
+    # 先按所需比例和像素上限取较小值，再限制在0.5~2.0之间（超大页面也不低于0.5）
+    return max(0.5, min(2.0, needed_zoom, max_zoom))
+
+
+def _render_ppt_picture(task):
+    """
+    渲染PDF第一页作为PPT图片，返回 (图片, 说明, 错误信息)，可在子进程中执行
+    图片为已导出的PNG路径（导出时的缩放比例不低于所需比例时直接复用）或JPEG字节（jpeg_quality为None时为PNG字节）
+    """
+    pdf_path, png_path, png_zoom, jpeg_quality, dpi, colorspace = task
+    try:
+        with fitz.open(pdf_path) as pdf_doc:
+            page = pdf_doc[0]
+            zoom = _ppt_zoom(page.rect, dpi)
+            info = f"PDF页面尺寸: {page.rect.width:.1f}x{page.rect.height:.1f}, 使用缩放比例: {zoom:.2f}"
+            if png_path and png_zoom >= zoom and os.path.exists(png_path):
+                return png_path, info, None
+            
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False,
+                                  colorspace=_render_colorspace(colorspace))
+            info += f", 生成图像尺寸: {pix.width}x{pix.height}"
+            data = None
+            if jpeg_quality:
+                # 幻灯片上的整页图片用JPEG，编码比PNG的deflate快得多，PPT文件也小很多
+                try:
+                    data = pix.tobytes("jpeg", jpg_quality=jpeg_quality)
+                except (TypeError, ValueError):
+                    pass  # 旧版PyMuPDF不支持JPEG输出
+            if data is None:
+                data = pix.tobytes("png")
+            pix = None  # 编码后立即释放像素缓冲区，并行渲染时降低内存峰值
+            return data, info, None
+    except Exception as e:
+        return None, None, str(e)
+
 
 class ExcelToPDFProcessor:
     """Excel转PDF表单处理核心类"""
     
-    def __init__(self):
+    def __init__(self, log_queue=None):
         self.excel_path = ""
         self.pdf_template_path = ""
         self.output_folder = ""
@@ -28,6 +350,14 @@ class ExcelToPDFProcessor:
         self.flatten_form = True
         self.output_png = False
         self.output_ppt = False
+        self.ppt_jpeg_quality = 85  # PPT中页面图片的JPEG质量，设为None则使用PNG
+        self.ppt_render_dpi = 150  # PPT中页面图片按幻灯片上的尺寸渲染的目标DPI
+        self.png_render_dpi = 144  # 导出PNG的DPI（144即2倍缩放）
+        self.png_compress_level = 1  # 导出PNG的压缩级别（0~9，经PIL编码），None则使用PyMuPDF默认编码
+        self.png_all_pages = False  # 导出PNG时是否渲染所有页面（默认只渲染第一页）
+        self.render_colorspace = "rgb"  # PNG/PPT页面渲染颜色空间，黑白模板可设为"gray"，数据量为RGB的1/3
+        self.raster_flatten_dpi = 150  # 栅格化扁平化（textbox扁平化失败时的备用方案）的渲染分辨率
+        self._excel_rows_cache = None  # 最近一次读取的工作表 ((路径, 工作表, 修改时间, 大小), (工作表名, 行元组))
 
         # 字体相关配置
         self.font_base_path = "resources/fonts"  # 字体库基础路径
@@ -38,9 +368,12 @@ class ExcelToPDFProcessor:
 
         # GUI日志回调函数
         self.gui_log_callback = None
+        self.gui_log_batch_callback = None
+        self._gui_log_buffer = []  # 待批量发送的GUI日志，见 log_to_gui_buffered
+        self._process_pool = None  # 本次运行共用的 (进程池, 日志监听器, 日志队列)，见 _start_process_pool
 
-        # 设置日志记录
-        self.setup_logging()
+        # 设置日志记录（进程池子进程传入 log_queue，日志交给主进程写入）
+        self.setup_logging(log_queue)
         
         # 初始化字体库
         self.load_available_fonts()
@@ -73,30 +406,33 @@ class ExcelToPDFProcessor:
         
     def excel_col_letter_to_index(self, col):
         """将Excel列字母如'A'转为列号索引，从0开始"""
-        result = 0
-        for c in col:
-            if 'A' <= c <= 'Z':
-                result = result * 26 + (ord(c) - ord('A') + 1)
-            elif 'a' <= c <= 'z':
-                result = result * 26 + (ord(c) - ord('a') + 1)
-            else:
-                return None
-        return result - 1
+        return _col_letter_to_index(col)
     
-    def setup_logging(self):
-        """设置日志记录"""
+    def setup_logging(self, log_queue=None):
+        """
+        设置日志记录
+        传入 log_queue（进程池子进程）时只把日志放入该队列，由主进程统一写入文件
+        """
         # 创建日志记录器
         self.logger = logging.getLogger('ExcelToPDFProcessor')
-        self.logger.setLevel(logging.DEBUG)
+        # 默认INFO级别，大批量任务逐字段的DEBUG日志本身就是瓶颈；需要排查时设置环境变量 LOG_LEVEL=DEBUG
+        log_level = getattr(logging, os.environ.get('LOG_LEVEL', 'INFO').upper(), logging.INFO)
+        self.logger.setLevel(log_level)
         
-        # 如果已经有处理器，先清除
+        if log_queue is not None:
+            self.logger.handlers.clear()
+            self.logger.addHandler(QueueHandler(log_queue))
+            return
+        
+        # 如果已经有处理器，先清除（并停止之前的监听线程）
         if self.logger.handlers:
             self.logger.handlers.clear()
+        _stop_log_listener()
         
-        # 创建文件处理器
+        # 创建文件处理器，首次写入时才打开文件
         log_file = 'app.log'
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setLevel(logging.DEBUG)
+        file_handler = logging.FileHandler(log_file, encoding='utf-8', delay=True)
+        file_handler.setLevel(log_level)
         
         # 创建格式化器
         formatter = logging.Formatter(
@@ -105,8 +441,12 @@ class ExcelToPDFProcessor:
         )
         file_handler.setFormatter(formatter)
         
-        # 添加处理器到记录器
-        self.logger.addHandler(file_handler)
+        # 记录器只把日志放入队列，由后台线程写入文件，处理过程不再等待磁盘IO
+        global _log_listener
+        log_queue = queue.SimpleQueue()
+        _log_listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        _log_listener.start()
+        self.logger.addHandler(QueueHandler(log_queue))
         
         self.logger.info("日志系统初始化完成")
     
@@ -114,6 +454,7 @@ class ExcelToPDFProcessor:
         """加载可用字体库"""
         self.default_fonts = {}  # 默认字体字典
         self.chinese_fonts = {}  # 中文字体字典
+        self._font_path_cache = {}  # (默认字体, 中文字体, 是否含中文) -> 字体路径
         
         # 加载默认字体
         default_path = os.path.join(self.font_base_path, "default")
@@ -134,6 +475,9 @@ class ExcelToPDFProcessor:
             for file in os.listdir(dir_path):
                 if file.lower().endswith(('.ttf', '.otf')):
                     font_path = os.path.join(dir_path, file)
+                    # 加载时确认一次文件有效，之后选择字体时不再逐次检查
+                    if not os.path.isfile(font_path):
+                        continue
                     font_name = os.path.splitext(file)[0]  # 直接使用文件名，不加前缀
                     font_dict[font_name] = font_path
         except Exception as e:
@@ -156,57 +500,96 @@ class ExcelToPDFProcessor:
     
     def has_chinese_characters(self, text):
         """检测文本中是否包含中文字符"""
-        if not text:
+        # 纯ASCII文本（数字、英文等最常见的单元格）在C层一次判断即可排除，无需进入正则
+        if not text or text.isascii():
             return False
         
-        # 中文字符的Unicode范围
-        chinese_pattern = re.compile(r'[\u4e00-\u9fff\u3400-\u4dbf\uf900-\ufaff]')
-        return bool(chinese_pattern.search(text))
+        return _CHINESE_RE.search(text) is not None
     
     def get_appropriate_font_path(self, text, default_font_name, chinese_font_name):
-        """根据文本内容选择合适的字体路径"""
+        """根据文本内容选择合适的字体路径，选择结果按字体设置和是否含中文缓存"""
         has_chinese = self.has_chinese_characters(text)
+        key = (default_font_name, chinese_font_name, has_chinese)
+        try:
+            return self._font_path_cache[key]
+        except KeyError:
+            pass
         
-        self.logger.debug(f"字体路径选择: 文本='{text[:20]}{'...' if len(text) > 20 else ''}', 包含中文={has_chinese}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("字体路径选择: 文本='%s%s', 包含中文=%s", text[:20], '...' if len(text) > 20 else '', has_chinese)
         
+        # 字体字典中的路径在加载时已确认存在
+        font_path = None
         if has_chinese and chinese_font_name:
-            font_path = self.get_font_path(chinese_font_name, is_chinese=True)
-            self.logger.debug(f"  尝试中文字体 '{chinese_font_name}': 路径={font_path}")
-            if font_path and os.path.exists(font_path):
-                self.logger.debug(f"  ✓ 使用中文字体: {font_path}")
-                return font_path
-            else:
-                self.logger.debug(f"  ✗ 中文字体不可用")
+            font_path = self.get_font_path(chinese_font_name, is_chinese=True) or None
+            self.logger.debug("  尝试中文字体 '%s': 路径=%s", chinese_font_name, font_path)
         
         # 使用默认字体
-        if default_font_name:
-            font_path = self.get_font_path(default_font_name, is_chinese=False)
-            self.logger.debug(f"  尝试默认字体 '{default_font_name}': 路径={font_path}")
-            if font_path and os.path.exists(font_path):
-                self.logger.debug(f"  ✓ 使用默认字体: {font_path}")
-                return font_path
-            else:
-                self.logger.debug(f"  ✗ 默认字体不可用")
+        if not font_path and default_font_name:
+            font_path = self.get_font_path(default_font_name, is_chinese=False) or None
+            self.logger.debug("  尝试默认字体 '%s': 路径=%s", default_font_name, font_path)
         
         # 如果都没有，返回None使用系统默认字体
-        self.logger.debug(f"  → 回退到系统默认字体")
-        return None
+        if not font_path:
+            self.logger.debug("  → 回退到系统默认字体")
+        
+        self._font_path_cache[key] = font_path
+        return font_path
     
-    def set_gui_log_callback(self, callback):
-        """设置GUI日志回调函数"""
+    def set_gui_log_callback(self, callback, batch_callback=None):
+        """设置GUI日志回调函数，batch_callback 接收 (operation, level, message) 列表，一次刷新界面"""
         self.gui_log_callback = callback
+        self.gui_log_batch_callback = batch_callback
     
     def log_to_gui(self, operation, level="info", message=""):
-        """发送日志到GUI（如果回调函数存在）"""
+        """发送日志到GUI（如果回调函数存在），先发送缓冲中的日志以保持顺序"""
+        self.flush_gui_logs()
         if self.gui_log_callback:
             try:
                 self.gui_log_callback(operation, level, message)
             except Exception as e:
                 self.logger.error(f"GUI日志回调失败: {e}")
+    
+    def log_to_gui_buffered(self, operation, level="info", message=""):
+        """
+        缓冲发送日志到GUI，循环中逐条的成功日志攒够 GUI_LOG_BATCH_SIZE 条后一次发送，减少界面刷新次数
+        之后的 log_to_gui 会先发送缓冲内容，循环结束时调用 flush_gui_logs 发送剩余日志
+        """
+        self._gui_log_buffer.append((operation, level, message))
+        if len(self._gui_log_buffer) >= GUI_LOG_BATCH_SIZE:
+            self.flush_gui_logs()
+    
+    def log_to_gui_batch(self, entries):
+        """批量发送日志到GUI（排在缓冲中的日志之后）"""
+        self._gui_log_buffer.extend(entries)
+        self.flush_gui_logs()
+    
+    def flush_gui_logs(self):
+        """发送缓冲中的GUI日志"""
+        entries = self._gui_log_buffer
+        if not entries:
+            return
+        self._gui_log_buffer = []
+        if self.gui_log_batch_callback:
+            try:
+                self.gui_log_batch_callback(entries)
+            except Exception as e:
+                self.logger.error(f"GUI日志回调失败: {e}")
+        elif self.gui_log_callback:
+            for operation, level, message in entries:
+                try:
+                    self.gui_log_callback(operation, level, message)
+                except Exception as e:
+                    self.logger.error(f"GUI日志回调失败: {e}")
 
     def is_excel_col_pattern(self, val):
         """判断字符串是不是Excel列格式（如'A'或'A,B'）"""
-        return re.fullmatch(r'([A-Za-z]+)(\s*,\s*[A-Za-z]+)*', val.strip()) is not None
+        # 逐段判断是否为纯ASCII字母，不经过正则引擎；isascii 排除中文等非拉丁字母
+        for part in val.split(','):
+            part = part.strip()
+            if not (part.isascii() and part.isalpha()):
+                return False
+        return True
     
     def extract_dispimg_id(self, cell_value):
         """从DISPIMG函数中提取图片ID"""
@@ -214,11 +597,8 @@ class ExcelToPDFProcessor:
             return None
         
         # 匹配DISPIMG函数格式：=DISPIMG("ID_xxx",1) 或 =_xlfn.DISPIMG("ID_xxx",1)
-        pattern = r'=(?:_xlfn\.)?DISPIMG\("([^"]+)"'
-        match = re.search(pattern, str(cell_value))
-        if match:
-            return match.group(1)
-        return None
+        match = _DISPIMG_RE.search(cell_value)
+        return match.group(1) if match else None
 
     def get_pdf_form_keys(self, pdf_path):
         """获取PDF表单字段列表"""
@@ -252,6 +632,29 @@ class ExcelToPDFProcessor:
         
         return fields
     
+    def load_pdf_template(self, pdf_path):
+        """
+        读取PDF模板字节并建立表单控件索引 {页码: ((控件xref, 字段名), ...)}
+        批量填充时每行直接从内存字节打开模板，并按xref直接加载需要填充的控件，不再逐页枚举全部控件
+        """
+        with open(pdf_path, 'rb') as f:
+            template_bytes = f.read()
+        
+        widget_index = {}
+        doc = fitz.open(stream=template_bytes, filetype="pdf")
+        try:
+            for page_num in range(len(doc)):
+                entries = tuple((w.xref, w.field_name) for w in doc[page_num].widgets() if w.field_name)
+                if entries:
+                    widget_index[page_num] = entries
+        finally:
+            doc.close()
+        
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("PDF模板已载入内存: %s, %d 字节, 含表单字段的页面: %s",
+                              pdf_path, len(template_bytes), sorted(widget_index))
+        return template_bytes, widget_index
+    
     def fill_pdf_image_field(self, page, widget, image_path):
         """在PDF表单域中填充图片"""
         try:
@@ -261,7 +664,7 @@ class ExcelToPDFProcessor:
             # 插入图片到字段区域
             page.insert_image(field_rect, filename=image_path, overlay=True)
             
-            self.logger.debug(f"成功在字段 '{widget.field_name}' 中插入图片: {image_path}")
+            self.logger.debug("成功在字段 '%s' 中插入图片: %s", widget.field_name, image_path)
             return True
         except Exception as e:
             self.logger.error(f"在字段 '{widget.field_name}' 中插入图片失败: {e}")
@@ -270,26 +673,12 @@ class ExcelToPDFProcessor:
     def fill_form_field_with_font(self, widget, value):
         """使用自定义字体填充表单字段（非扁平化模式）"""
         try:
-            # 获取合适的字体路径
-            font_path = self.get_appropriate_font_path(value, self.default_font, self.chinese_font)
-            
-            # 设置字段值
+            # 设置字段值并只生成一次外观流（update 是填充中最耗时的操作）
+            # PyMuPDF 的表单字段无法引用外部字体文件，字段使用其自身的字体设置，
+            # 因此这里不再为每个字段查找字体路径
             widget.field_value = value
-            
-            # 如果有自定义字体，尝试设置字体
-            if font_path and os.path.exists(font_path):
-                try:
-                    # 尝试设置字体（这个功能在某些PDF中可能不完全支持）
-                    # PyMuPDF的表单字段字体设置有限，但我们仍然尝试
-                    widget.update()
-                    self.logger.debug(f"字段 '{widget.field_name}' 使用字体: {font_path}")
-                except Exception as font_error:
-                    # 如果字体设置失败，仍然使用默认字体填充
-                    self.logger.debug(f"字段 '{widget.field_name}' 字体设置失败，使用默认字体: {font_error}")
-            else:
-                # 使用默认字体
-                widget.update()
-                self.logger.debug(f"字段 '{widget.field_name}' 使用默认字体")
+            widget.update()
+            self.logger.debug("字段 '%s' 已填充", widget.field_name)
             
             return True
             
@@ -297,18 +686,58 @@ class ExcelToPDFProcessor:
             self.logger.error(f"填充表单字段 '{widget.field_name}' 失败: {e}")
             return False
 
-    def fill_pdf_form(self, input_pdf_path, output_pdf_path, data_dict, image_dict=None, flatten_form=False):
-        """使用PyMuPDF填充PDF表单"""
-        self.logger.debug(f"开始填充PDF表单: {output_pdf_path}")
-        self.logger.debug(f"填充数据: {data_dict}")
+    def fill_pdf_form(self, input_pdf_path, output_pdf_path, data_dict, image_dict=None, flatten_form=False,
+                      template_bytes=None, widget_index=None):
+        """
+        使用PyMuPDF填充PDF表单
+        template_bytes/widget_index 由 load_pdf_template 提供，传入时直接从内存打开模板并只加载待填字段的控件
+        """
+        self.logger.debug("开始填充PDF表单: %s", output_pdf_path)
+        self.logger.debug("填充数据: %s", data_dict)
         
+        doc = None
         try:
-            doc = fitz.open(input_pdf_path)
+            if widget_index is not None:
+                # 空值不会被填充，不计入待填字段
+                wanted = {name for name, value in data_dict.items() if str(value)}
+                if image_dict:
+                    wanted.update(image_dict)
+                if not wanted and not flatten_form and template_bytes is not None:
+                    # 本行没有任何待填字段，直接输出模板副本，无需解析和重新保存PDF
+                    with open(output_pdf_path, 'wb') as f:
+                        f.write(template_bytes)
+                    self.logger.info(f"PDF填充完成: {output_pdf_path}, 没有需要填充的字段")
+                    return True, "成功填充了 0 个字段"
+            
+            if template_bytes is not None:
+                doc = fitz.open(stream=template_bytes, filetype="pdf")
+            else:
+                doc = fitz.open(input_pdf_path)
             
             filled_count = 0
-            for page_num in range(len(doc)):
+            if widget_index is not None:
+                load_names = wanted
+                if flatten_form:
+                    # 扁平化时文本字段在 flatten_form_with_textbox 中绘制，这里只加载图片字段的控件，
+                    # 文本字段直接按控件索引计数
+                    load_names = set(image_dict or ())
+                    text_names = wanted - load_names
+                    filled_count = sum(1 for entries in widget_index.values()
+                                       for _, name in entries if name in text_names)
+                targets = []
+                for page_num, entries in widget_index.items():
+                    xrefs = [xref for xref, name in entries if name in load_names]
+                    if xrefs:
+                        targets.append((page_num, xrefs))
+            else:
+                targets = [(page_num, None) for page_num in range(len(doc))]
+            
+            for page_num, xrefs in targets:
                 page = doc[page_num]
-                widgets = page.widgets()
+                if xrefs is None:
+                    widgets = page.widgets()
+                else:
+                    widgets = (page.load_widget(xref) for xref in xrefs)
                 
                 for widget in widgets:
                     field_name = widget.field_name
@@ -329,24 +758,21 @@ class ExcelToPDFProcessor:
                                 if flatten_form:
                                     # 扁平化表单时只记录，实际填充在后面的扁平化过程中进行
                                     filled_count += 1
-                                    self.logger.debug(f"准备处理字段 '{field_name}': 值='{value}'")
+                                    self.logger.debug("准备处理字段 '%s': 值='%s'", field_name, value)
                                 else:
                                     # 非扁平化表单：直接填充到表单字段中，支持字体选择
                                     success = self.fill_form_field_with_font(widget, value)
                                     if success:
                                         filled_count += 1
-                                        self.logger.debug(f"成功填充字段 '{field_name}': 值='{value}'")
+                                        self.logger.debug("成功填充字段 '%s': 值='%s'", field_name, value)
                                     else:
                                         self.logger.warning(f"填充字段 '{field_name}' 失败")
                             except Exception as e:
                                 self.logger.error(f"填充字段 '{field_name}' 时出错: {e}")
             
-            # 确保输出目录存在
-            os.makedirs(os.path.dirname(output_pdf_path), exist_ok=True)
-            
             # 保存文档
             if flatten_form:
-                # 扁平化表单：优先使用 convert_to_pdf；失败时回退为“栅格化扁平化”（将整页渲染为图片）
+                # 扁平化表单：优先用textbox方式（矢量复制页面并以insert_text重绘文本）；失败时回退为“栅格化扁平化”（将整页渲染为图片）
                 self.logger.debug("正在扁平化表单...")
                 try:
                     self.flatten_form_with_textbox(doc, output_pdf_path, data_dict, image_dict)
@@ -355,12 +781,11 @@ class ExcelToPDFProcessor:
                     self.logger.error(f"textbox 扁平化失败，启用栅格化备用方案: {e}")
                     self.log_to_gui("扁平化处理", "warning", f"textbox扁平化失败，启用栅格化备用方案: {str(e)[:50]}...")
                     # 注意：该方式会生成不可编辑、不可检索的图像PDF，但能彻底避免字体替代错误
-                    self.rasterize_flatten_doc(doc, output_pdf_path, dpi=200)
+                    self.rasterize_flatten_doc(doc, output_pdf_path, dpi=self.raster_flatten_dpi)
                     self.log_to_gui("扁平化处理", "info", "栅格化扁平化完成（图像PDF，不可编辑）")
             else:
                 doc.save(output_pdf_path, incremental=False, encryption=fitz.PDF_ENCRYPT_NONE)
             
-            doc.close()
             success_msg = f"成功填充了 {filled_count} 个字段"
             self.logger.info(f"PDF填充完成: {output_pdf_path}, {success_msg}")
             return True, success_msg
@@ -369,6 +794,192 @@ class ExcelToPDFProcessor:
             error_msg = f"PDF填充失败: {e}"
             self.logger.error(f"填充PDF失败 {output_pdf_path}: {error_msg}")
             return False, error_msg
+        finally:
+            # 失败时同样释放MuPDF文档
+            if doc is not None:
+                doc.close()
+
+    def read_excel_rows(self, excel_path, sheet_name=None):
+        """
+        以只读流式方式读取工作表的单元格值，返回 (工作表名, 行元组列表)
+        sheet_name 为空时读取第一个工作表；末尾的空行会被去掉
+        只保留最近一次读取的工作表（按 路径、工作表、修改时间、大小 判断），文件未变化时重复运行
+        （如切换预设后再次生成）不再重新解析；可调用 clear_excel_cache 释放
+        """
+        try:
+            st = os.stat(excel_path)
+            cache_key = (os.path.abspath(excel_path), sheet_name or None, st.st_mtime_ns, st.st_size)
+        except OSError:
+            cache_key = None
+        
+        cached = self._excel_rows_cache
+        if cache_key is not None and cached is not None and cached[0] == cache_key:
+            self.logger.info(f"Excel文件未变化，使用已读取的数据: {excel_path}")
+            return cached[1]
+        
+        # 先释放旧数据，避免读取新表时新旧两份同时占用内存
+        self._excel_rows_cache = None
+        result = self._read_excel_rows_uncached(excel_path, sheet_name)
+        if cache_key is not None:
+            self._excel_rows_cache = (cache_key, result)
+        return result
+
+    def clear_excel_cache(self):
+        """释放已缓存的工作表数据"""
+        self._excel_rows_cache = None
+
+    def _read_excel_rows_uncached(self, excel_path, sheet_name=None):
+        """读取工作表：安装了 python-calamine 时优先使用，否则使用openpyxl只读模式"""
+        if CalamineWorkbook is not None:
+            try:
+                return self._read_excel_rows_calamine(excel_path, sheet_name)
+            except Exception as e:
+                self.logger.warning(f"calamine读取Excel失败，改用openpyxl: {e}")
+        
+        wb = openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+            # 部分软件写入的dimension不准确，重置后按实际内容读取
+            ws.reset_dimensions()
+            rows = list(ws.iter_rows(values_only=True))
+            title = ws.title
+        finally:
+            wb.close()
+        
+        while rows and all(v is None for v in rows[-1]):
+            rows.pop()
+        return title, tuple(rows)
+
+    def _read_excel_rows_calamine(self, excel_path, sheet_name=None):
+        """
+        使用calamine读取工作表，结果与openpyxl保持一致：
+        空单元格为None，整数值为int（calamine把所有数字读成float），
+        只有日期的单元格为当天0点的datetime（calamine读成date，openpyxl读成datetime）；
+        时间单元格两者都读成time
+        """
+        def normalize(v):
+            if v == "":
+                return None
+            value_type = type(v)
+            if value_type is float and v.is_integer():
+                return int(v)
+            if value_type is date:
+                return datetime.combine(v, time())
+            return v
+        
+        wb = CalamineWorkbook.from_path(excel_path)
+        title = sheet_name if sheet_name else wb.sheet_names[0]
+        # 不跳过左上角的空白区域，保证行列索引与Excel一致
+        data = wb.get_sheet_by_name(title).to_python(skip_empty_area=False)
+        rows = [tuple(map(normalize, r)) for r in data]
+        
+        while rows and all(v is None for v in rows[-1]):
+            rows.pop()
+        self.logger.debug("使用calamine读取工作表: %s", title)
+        return title, tuple(rows)
+
+    def compile_field_mapping(self):
+        """
+        预先解析字段映射，避免在每一行中重复判断映射类型和转换列字母
+        返回 [(pdf_key, kind, col_indices, map_val)]，kind 为 _FIELD_* 常量之一
+        """
+        compiled = []
+        for pdf_key, map_config in self.field_mapping.items():
+            if isinstance(map_config, dict):
+                is_excel_col = map_config.get("is_excel_col", True)
+                is_excel_image = map_config.get("is_excel_image", False)
+                map_val = str(map_config.get("val", ""))
+                # 只有Excel列才需要strip，自定义值保留原始格式（包括空格）
+                if is_excel_col or is_excel_image:
+                    map_val = map_val.strip()
+            else:
+                # 向后兼容旧格式
+                map_val = str(map_config)
+                # 判断是否为Excel列格式，如果是才strip
+                if self.is_excel_col_pattern(map_val.strip()):
+                    map_val = map_val.strip()
+                    is_excel_col = True
+                    is_excel_image = False
+                else:
+                    is_excel_col = False
+                    is_excel_image = False
+
+            if is_excel_image:
+                col_indices = (self.excel_col_letter_to_index(map_val.upper()),)
+                compiled.append((pdf_key, _FIELD_IMAGE_COL, col_indices, map_val))
+            elif is_excel_col:
+                col_indices = tuple(self.excel_col_letter_to_index(col.strip().upper())
+                                    for col in map_val.split(","))
+                compiled.append((pdf_key, _FIELD_TEXT_COLS, col_indices, map_val))
+            else:
+                compiled.append((pdf_key, _FIELD_CUSTOM, (), map_val))
+        return compiled
+
+    def _start_process_pool(self, workers, template_bytes, widget_index):
+        """
+        启动本次运行共用的进程池，填充PDF、转换PNG、渲染PPT页面各阶段复用同一个池，只付一次启动开销
+        子进程的日志经队列交给本进程的日志处理器写入文件；运行结束时调用 _shutdown_process_pool
+        """
+        settings = {name: getattr(self, name) for name in _FILL_WORKER_SETTINGS}
+        log_queue = multiprocessing.Queue()
+        log_listener = QueueListener(log_queue, *self.logger.handlers, respect_handler_level=True)
+        log_listener.start()
+        try:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_fill_worker,
+                                           initargs=(settings, template_bytes, widget_index, log_queue))
+        except Exception:
+            log_listener.stop()
+            log_queue.close()
+            raise
+        self._process_pool = (executor, log_listener, log_queue)
+        return executor
+    
+    def _shutdown_process_pool(self):
+        """关闭本次运行共用的进程池（没有时什么也不做）"""
+        if self._process_pool is None:
+            return
+        executor, log_listener, log_queue = self._process_pool
+        self._process_pool = None
+        try:
+            executor.shutdown()
+        finally:
+            log_listener.stop()
+            log_queue.close()
+
+    def _fill_pdfs(self, fill_tasks, template_bytes, widget_index):
+        """
+        填充所有行的PDF，按完成顺序逐个产出 (任务序号, 是否成功, 消息)
+        行数达到 PARALLEL_MIN_TASKS 且输出文件不重名时使用进程池并行填充（进程池留给后续PNG/PPT阶段复用），
+        进程池不可用时回退为逐行填充
+        """
+        output_paths = [task[1] for task in fill_tasks]
+        done = set()
+        
+        if (FILL_WORKERS > 1 and len(fill_tasks) >= PARALLEL_MIN_TASKS
+                and len(set(output_paths)) == len(output_paths)):
+            try:
+                executor = self._start_process_pool(min(FILL_WORKERS, len(fill_tasks)), template_bytes, widget_index)
+                futures = [executor.submit(_fill_worker, task) for task in fill_tasks]
+                for future in as_completed(futures):
+                    index, success, message, gui_logs = future.result()
+                    done.add(index)
+                    # 子进程中产生的提示（如栅格化备用方案）在主进程发送到GUI
+                    self.log_to_gui_batch(gui_logs)
+                    yield index, success, message
+                return
+            except Exception as e:
+                self._shutdown_process_pool()
+                self.logger.warning(f"并行填充PDF失败，改为逐行填充: {e}")
+                self.log_to_gui("PDF填充", "warning", f"并行填充不可用，改为逐行填充: {str(e)[:50]}")
+        
+        for index, output_pdf_path, data, image_data, flatten_form in fill_tasks:
+            if index in done:
+                continue
+            success, message = self.fill_pdf_form(
+                self.pdf_template_path, output_pdf_path, data, image_data, flatten_form,
+                template_bytes=template_bytes, widget_index=widget_index
+            )
+            yield index, success, message
 
     def process_excel_to_pdf(self, progress_callback=None):
         """主要处理函数：将Excel数据填充到PDF表单"""
@@ -399,23 +1010,19 @@ class ExcelToPDFProcessor:
             
             # 读取Excel数据
             # 处理sheet_name为空的情况
-            sheet_to_read = self.sheet_name if self.sheet_name and self.sheet_name.strip() else 0
-            self.logger.info(f"读取Excel sheet: {sheet_to_read if sheet_to_read != 0 else '第一个sheet'}")
+            sheet_to_read = self.sheet_name if self.sheet_name and self.sheet_name.strip() else None
+            self.logger.info(f"读取Excel sheet: {sheet_to_read if sheet_to_read else '第一个sheet'}")
             
-            df = pd.read_excel(self.excel_path, sheet_name=sheet_to_read, header=None)
-            
-            # 如果返回的是字典（多个sheet），取第一个
-            if isinstance(df, dict):
-                sheet_names = list(df.keys())
-                df = df[sheet_names[0]]
-                self.logger.info(f"读取到多个sheet，使用第一个: {sheet_names[0]}")
+            sheet_title, rows = self.read_excel_rows(self.excel_path, sheet_to_read)
             
             title_row_idx = self.title_row - 1
             data_start_idx = self.start_row - 1
-            self.logger.info(f"Excel数据读取完成，总行数: {len(df)}")
+            self.logger.info(f"Excel数据读取完成，工作表: {sheet_title}，总行数: {len(rows)}")
             
-            # 获取PDF表单字段
-            pdf_keys = self.get_pdf_form_keys(self.pdf_template_path)
+            # 模板只读取一次，每行从内存字节打开；同时得到PDF表单字段
+            template_bytes, widget_index = self.load_pdf_template(self.pdf_template_path)
+            pdf_keys = {name for entries in widget_index.values() for _, name in entries}
+            self.logger.info(f"成功获取到 {len(pdf_keys)} 个PDF表单字段")
             
             # 检查字段映射
             missing_fields = []
@@ -429,71 +1036,101 @@ class ExcelToPDFProcessor:
                 print(warning_msg)
             
             # 处理每一行数据
-            total_rows = len(df.iloc[data_start_idx:])
+            data_rows = rows[data_start_idx:]
+            total_rows = len(data_rows)
             success_count = 0
             error_messages = []
             generated_pdf_paths = []  # 存储成功生成的PDF文件路径
             self.logger.info(f"开始处理数据，共 {total_rows} 行")
             self.log_to_gui("开始数据处理", "info", f"共 {total_rows} 行数据待处理")
             
-            for idx, row in df.iloc[data_start_idx:].iterrows():
+            fill_tasks = []  # 待填充的PDF任务 (任务序号, 输出路径, 数据, 图片, 是否扁平化)
+            task_rows = []  # 任务序号对应的Excel行号
+            
+            # 字段映射和文件名列只与配置有关，循环外预先解析一次
+            compiled_mapping = self.compile_field_mapping()
+            filename_col_idx = None
+            if self.filename_column and self.filename_column.strip():
+                filename_col_idx = self.excel_col_letter_to_index(self.filename_column.strip())
+            
+            # 文件名列整列一次性取值并清理非法字符，空值为""（回退为行号）
+            filenames = None
+            if filename_col_idx is not None:
+                filenames = [
+                    str(r[filename_col_idx]).strip().translate(_INVALID_FN_CHARS_TRANS)
+                    if filename_col_idx < len(r) and r[filename_col_idx] is not None else ""
+                    for r in data_rows
+                ]
+            
+            # 图片提取相关的结果在本次任务内复用：浮动图片列表、工作表名、按ID已提取的图片
+            floating_images = None
+            image_sheet_name = sheet_title
+            extracted_by_id = {}
+            log_details = self.logger.isEnabledFor(logging.DEBUG)
+            
+            # 临时图片目录只在有图片字段时创建一次
+            temp_image_dir = os.path.join(self.output_folder, "temp_images")
+            image_cols = [col_indices[0] for _, kind, col_indices, _ in compiled_mapping
+                          if kind == _FIELD_IMAGE_COL and col_indices[0] is not None]
+            if image_cols:
+                os.makedirs(temp_image_dir, exist_ok=True)
+                
+                # 预先收集所有行引用的DISPIMG图片ID，打开一次文件批量提取
+                wanted_ids = set()
+                for r in data_rows:
+                    for col_idx in image_cols:
+                        if col_idx < len(r) and r[col_idx]:
+                            image_id = self.extract_dispimg_id(str(r[col_idx]))
+                            if image_id:
+                                wanted_ids.add(image_id)
+                if wanted_ids:
+                    try:
+                        extracted_by_id.update(CatchExcelImageTool.extract_images_by_ids(
+                            self.excel_path, wanted_ids, temp_image_dir))
+                        self.logger.info(f"批量提取DISPIMG图片: {len(wanted_ids)} 个ID")
+                    except Exception as e:
+                        # 批量提取失败时在循环中按ID逐个提取
+                        self.logger.warning(f"批量提取图片失败，改为逐个提取: {e}")
+            
+            # 每行都是openpyxl读出的值元组，空单元格为None
+            for idx, row in enumerate(data_rows, start=data_start_idx):
                 row_num = idx + 1
                 actual_row_num = idx - data_start_idx + 1
                 
                 try:
                     self.logger.info(f"开始处理第 {row_num} 行数据 (数据行 {actual_row_num}/{total_rows})")
-                    self.log_to_gui(f"处理第{row_num}行", "info", f"开始处理 (数据行 {actual_row_num}/{total_rows})")
                     
                     # 构建数据字典和图片字典
                     data = {}
                     image_data = {}
-                    field_details = []  # 记录字段映射详情
+                    field_details = []  # 记录字段映射详情（仅DEBUG级别时收集）
                     
-                    for pdf_key, map_config in self.field_mapping.items():
-                        if isinstance(map_config, dict):
-                            is_excel_col = map_config.get("is_excel_col", True)
-                            is_excel_image = map_config.get("is_excel_image", False)
-                            map_val = str(map_config.get("val", ""))
-                            # 只有Excel列才需要strip，自定义值保留原始格式（包括空格）
-                            if is_excel_col or is_excel_image:
-                                map_val = map_val.strip()
-                        else:
-                            # 向后兼容旧格式
-                            map_val = str(map_config)
-                            # 判断是否为Excel列格式，如果是才strip
-                            if self.is_excel_col_pattern(map_val.strip()):
-                                map_val = map_val.strip()
-                                is_excel_col = True
-                                is_excel_image = False
-                            else:
-                                is_excel_col = False
-                                is_excel_image = False
-                        
-                        if is_excel_image:
+                    for pdf_key, kind, col_indices, map_val in compiled_mapping:
+                        if kind == _FIELD_IMAGE_COL:
                             # 处理Excel图片列
-                            col_idx = self.excel_col_letter_to_index(map_val.upper())
+                            col_idx = col_indices[0]
                             if col_idx is not None and col_idx < len(row):
                                 cell_val = row[col_idx]
                                 # 对于图片字段，即使单元格为空也要尝试提取浮动图片
                                 should_extract_image = True
                                 
                                 if should_extract_image:
-                                    # 创建临时图片目录
-                                    temp_image_dir = os.path.join(self.output_folder, "temp_images")
-                                    os.makedirs(temp_image_dir, exist_ok=True)
-                                    
                                     # 首先尝试提取DISPIMG中的图片ID（仅当单元格不为空时）
                                     image_id = None
                                     image_path = None
                                     
-                                    if not pd.isna(cell_val) and cell_val:
+                                    if cell_val is not None and cell_val:
                                         image_id = self.extract_dispimg_id(str(cell_val))
                                     
                                     if image_id:
-                                        # DISPIMG格式图片
-                                        image_path = CatchExcelImageTool.extract_image_by_id(
-                                            self.excel_path, image_id, temp_image_dir
-                                        )
+                                        # DISPIMG格式图片，同一ID只提取一次
+                                        if image_id in extracted_by_id:
+                                            image_path = extracted_by_id[image_id]
+                                        else:
+                                            image_path = CatchExcelImageTool.extract_image_by_id(
+                                                self.excel_path, image_id, temp_image_dir
+                                            )
+                                            extracted_by_id[image_id] = image_path
                                         if image_path:
                                             image_data[pdf_key] = image_path
                                             field_details.append(f"{pdf_key}={map_val}(DISPIMG-ID:{image_id})→图片已提取")
@@ -507,23 +1144,15 @@ class ExcelToPDFProcessor:
                                         from openpyxl.utils import get_column_letter
                                         cell_address = f"{get_column_letter(col_idx + 1)}{row_num}"
                                         
-                                        # 获取工作表名称
-                                        sheet_to_use = self.sheet_name if self.sheet_name and self.sheet_name.strip() else None
-                                        if not sheet_to_use:
-                                            # 如果没有指定工作表名，尝试获取第一个工作表名
-                                            try:
-                                                import openpyxl
-                                                wb_temp = openpyxl.load_workbook(self.excel_path, read_only=True)
-                                                sheet_to_use = wb_temp.sheetnames[0]
-                                                wb_temp.close()
-                                            except:
-                                                sheet_to_use = "Sheet1"  # 默认工作表名
+                                        # 工作表名称在读取数据时已确定
+                                        sheet_to_use = image_sheet_name
                                         
-                                        self.logger.debug(f"尝试从单元格 {cell_address} (工作表: {sheet_to_use}) 提取浮动图片")
+                                        self.logger.debug("尝试从单元格 %s (工作表: %s) 提取浮动图片", cell_address, sheet_to_use)
                                         
-                                        # 先检查是否有浮动图片存在
-                                        floating_images = CatchExcelImageTool._extract_floating_images(self.excel_path)
-                                        self.logger.debug(f"Excel文件中发现的浮动图片: {floating_images}")
+                                        # 先检查是否有浮动图片存在（整个文件只扫描一次）
+                                        if floating_images is None:
+                                            floating_images = CatchExcelImageTool._extract_floating_images(self.excel_path)
+                                            self.logger.debug("Excel文件中发现的浮动图片: %s", floating_images)
                                         
                                         image_path = CatchExcelImageTool.extract_image_from_cell(
                                             self.excel_path, sheet_to_use, cell_address, temp_image_dir
@@ -543,77 +1172,41 @@ class ExcelToPDFProcessor:
                                                 self.logger.warning(f"单元格 {cell_address} 未发现任何图片")
                                 # 如果最终没有提取到任何图片，记录相应信息
                                 if not image_path:
-                                    if pd.isna(cell_val) or not cell_val:
+                                    if cell_val is None or not cell_val:
                                         field_details.append(f"{pdf_key}={map_val}→单元格为空且未找到浮动图片")
                                     else:
                                         field_details.append(f"{pdf_key}={map_val}→单元格有值但未找到图片")
                             else:
                                 field_details.append(f"{pdf_key}={map_val}→列索引无效")
-                        elif is_excel_col:
-                            # 处理Excel列值
-                            col_list = [col.strip().upper() for col in map_val.split(",")]
-                            cell_values = []
-                            for col in col_list:
-                                col_idx = self.excel_col_letter_to_index(col)
-                                if col_idx is not None and col_idx < len(row):
-                                    val = row[col_idx]
-                                    cell_val = "" if pd.isna(val) else str(val)
-                                    cell_values.append(cell_val)
-                                else:
-                                    cell_values.append("")
-                            final_value = self.col_separator.join(cell_values)
+                        elif kind == _FIELD_TEXT_COLS:
+                            # 处理Excel列值（单列时不经过列表拼接）
+                            if len(col_indices) == 1:
+                                final_value = _cell_text(row, col_indices[0])
+                            else:
+                                final_value = self.col_separator.join([_cell_text(row, i) for i in col_indices])
                             data[pdf_key] = final_value
-                            field_details.append(f"{pdf_key}={map_val}→'{final_value}'")
+                            if log_details:
+                                field_details.append(f"{pdf_key}={map_val}→'{final_value}'")
                         else:
                             # 直接使用自定义值，保留空格
                             data[pdf_key] = map_val
-                            field_details.append(f"{pdf_key}=自定义值→'{map_val}'")
+                            if log_details:
+                                field_details.append(f"{pdf_key}=自定义值→'{map_val}'")
                     
-                    self.logger.debug(f"第 {row_num} 行字段映射详情: {'; '.join(field_details)}")
+                    if log_details:
+                        self.logger.debug("第 %s 行字段映射详情: %s", row_num, '; '.join(field_details))
                     
-                    # 生成输出文件名
-                    if self.filename_column and self.filename_column.strip():
-                        # 使用指定列的数据作为文件名
-                        try:
-                            filename_col_idx = self.excel_col_letter_to_index(self.filename_column.strip())
-                            if filename_col_idx is not None and filename_col_idx < len(row):
-                                filename_value = str(row.iloc[filename_col_idx]).strip()
-                                # 清理文件名中的非法字符
-                                filename_value = re.sub(r'[<>:"/\\|?*]', '_', filename_value)
-                                if filename_value:
-                                    output_filename = f"{filename_value}.pdf"
-                                else:
-                                    output_filename = f"{actual_row_num}.pdf"  # 去掉filled_前缀，只保留数字
-                            else:
-                                output_filename = f"{actual_row_num}.pdf"  # 去掉filled_前缀，只保留数字
-                        except:
-                            output_filename = f"{actual_row_num}.pdf"  # 去掉filled_前缀，只保留数字
+                    # 生成输出文件名（指定了文件名列时使用该列数据，否则使用数字编号）
+                    if filenames and filenames[actual_row_num - 1]:
+                        output_filename = f"{filenames[actual_row_num - 1]}.pdf"
                     else:
-                        # 使用数字编号，去掉filled_前缀
                         output_filename = f"{actual_row_num}.pdf"
                     
                     output_pdf_path = os.path.join(self.output_folder, output_filename)
                     
-                    # 填充PDF表单
-                    success, message = self.fill_pdf_form(
-                        self.pdf_template_path, output_pdf_path, data, image_data, self.flatten_form
-                    )
-                    
-                    if success:
-                        success_count += 1
-                        generated_pdf_paths.append(output_pdf_path)  # 记录成功生成的PDF路径
-                        self.logger.info(f"第 {row_num} 行处理成功 → {os.path.basename(output_pdf_path)}")
-                        self.log_to_gui(f"第{row_num}行", "success", f"处理成功 → {os.path.basename(output_pdf_path)}")
-                    else:
-                        error_msg = f"第{row_num}行: {message}"
-                        error_messages.append(error_msg)
-                        self.logger.error(f"第 {row_num} 行处理失败: {message}")
-                        self.log_to_gui(f"第{row_num}行", "error", f"处理失败: {message}")
-                    
-                    # 更新进度
-                    if progress_callback:
-                        progress = actual_row_num / total_rows * 100
-                        progress_callback(progress, f"处理第 {row_num} 行")
+                    # 行数据准备完成，PDF填充统一在循环后进行（可并行）
+                    fill_tasks.append((len(fill_tasks), output_pdf_path, data, image_data, self.flatten_form))
+                    task_rows.append(row_num)
                         
                 except Exception as e:
                     error_msg = f"第{row_num}行处理失败: {e}"
@@ -621,6 +1214,33 @@ class ExcelToPDFProcessor:
                     self.logger.error(f"第 {row_num} 行处理异常: {str(e)}")
                     self.log_to_gui(f"第{row_num}行", "error", f"处理异常: {str(e)}")
             
+            # 填充PDF表单
+            generated = {}  # 任务序号 -> 成功生成的PDF路径，最后按行顺序输出
+            finished = total_rows - len(fill_tasks)
+            for index, success, message in self._fill_pdfs(fill_tasks, template_bytes, widget_index):
+                row_num = task_rows[index]
+                output_pdf_path = fill_tasks[index][1]
+                
+                if success:
+                    success_count += 1
+                    generated[index] = output_pdf_path  # 记录成功生成的PDF路径
+                    self.logger.info(f"第 {row_num} 行处理成功 → {os.path.basename(output_pdf_path)}")
+                    self.log_to_gui_buffered(f"第{row_num}行", "success", f"处理成功 → {os.path.basename(output_pdf_path)}")
+                else:
+                    error_msg = f"第{row_num}行: {message}"
+                    error_messages.append(error_msg)
+                    self.logger.error(f"第 {row_num} 行处理失败: {message}")
+                    self.log_to_gui(f"第{row_num}行", "error", f"处理失败: {message}")
+                
+                # 更新进度
+                finished += 1
+                if progress_callback:
+                    progress = finished / total_rows * 100
+                    progress_callback(progress, f"处理第 {row_num} 行")
+            
+            self.flush_gui_logs()
+            generated_pdf_paths.extend(generated[i] for i in sorted(generated))
+            
             # 记录处理结果
             self.logger.info(f"处理完成 - 总行数: {total_rows}, 成功: {success_count}, 失败: {len(error_messages)}")
             if error_messages:
@@ -645,10 +1265,7 @@ class ExcelToPDFProcessor:
                 # 转换为PNG图片
                 if self.output_png:
                     self.log_to_gui("PNG转换", "info", "开始转换PDF为PNG图片...")
-                    for pdf_path in generated_pdf_paths:
-                        png_path = self.convert_pdf_to_png(pdf_path, self.output_folder)
-                        if png_path:
-                            png_paths.append(png_path)
+                    png_paths = self.convert_pdfs_to_png(generated_pdf_paths, self.output_folder, self.png_render_dpi)
                     
                     if png_paths:
                         self.log_to_gui("PNG转换", "success", f"成功转换 {len(png_paths)} 个PNG图片")
@@ -658,7 +1275,7 @@ class ExcelToPDFProcessor:
                 # 创建PPT文件
                 if self.output_ppt:
                     self.log_to_gui("PPT创建", "info", "开始创建PPT文件...")
-                    ppt_path = self.create_ppt_from_pdfs(generated_pdf_paths, self.output_folder)
+                    ppt_path = self.create_ppt_from_pdfs(generated_pdf_paths, self.output_folder, png_paths)
                     
                     if ppt_path:
                         self.log_to_gui("PPT创建", "success", "PPT文件创建成功")
@@ -683,6 +1300,11 @@ class ExcelToPDFProcessor:
                 "success": False,
                 "error": error_msg
             }
+        finally:
+            # 关闭填充、PNG、PPT各阶段共用的进程池
+            self._shutdown_process_pool()
+            # 释放提取图片时打开的workbook，避免处理结束后Excel文件仍被占用
+            CatchExcelImageTool.close_cached_workbooks()
 
     def save_preset(self, preset_path):
         """保存预设配置到JSON文件"""
@@ -701,6 +1323,14 @@ class ExcelToPDFProcessor:
             "flatten_form": self.flatten_form,
             "output_png": self.output_png,
             "output_ppt": self.output_ppt,
+            # 渲染配置
+            "png_render_dpi": self.png_render_dpi,
+            "png_compress_level": self.png_compress_level,
+            "png_all_pages": self.png_all_pages,
+            "render_colorspace": self.render_colorspace,
+            "ppt_render_dpi": self.ppt_render_dpi,
+            "ppt_jpeg_quality": self.ppt_jpeg_quality,
+            "raster_flatten_dpi": self.raster_flatten_dpi,
             # 字体配置
             "font_base_path": self.font_base_path,  # 新增：字体库路径
             "default_font": self.default_font,
@@ -708,8 +1338,15 @@ class ExcelToPDFProcessor:
         }
         
         try:
-            with open(preset_path, 'w', encoding='utf-8') as f:
-                json.dump(preset_data, f, ensure_ascii=False, indent=2)
+            if orjson is not None:
+                # 直接写入UTF-8字节，格式与 json.dump(indent=2, ensure_ascii=False) 一致
+                with open(preset_path, 'wb') as f:
+                    f.write(orjson.dumps(preset_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            else:
+                # 先整体序列化再一次写入，json.dump 会对每个片段单独调用 write()
+                data = json.dumps(preset_data, ensure_ascii=False, indent=2)
+                with open(preset_path, 'w', encoding='utf-8') as f:
+                    f.write(data)
             success_msg = "预设保存成功"
             self.logger.info(f"预设配置保存成功: {preset_path}")
             return True, success_msg
@@ -723,8 +1360,12 @@ class ExcelToPDFProcessor:
         self.logger.info(f"开始加载预设配置: {preset_path}")
         
         try:
-            with open(preset_path, 'r', encoding='utf-8') as f:
-                preset_data = json.load(f)
+            if orjson is not None:
+                with open(preset_path, 'rb') as f:
+                    preset_data = orjson.loads(f.read())
+            else:
+                with open(preset_path, 'r', encoding='utf-8') as f:
+                    preset_data = json.load(f)
             
             self.excel_path = preset_data.get("excel_path", "")
             self.pdf_template_path = preset_data.get("pdf_template_path", "")
@@ -739,6 +1380,15 @@ class ExcelToPDFProcessor:
             self.output_png = preset_data.get("output_png", False)
             self.output_ppt = preset_data.get("output_ppt", False)
             
+            # 加载渲染配置（旧预设中没有时使用默认值）
+            self.png_render_dpi = preset_data.get("png_render_dpi", 144)
+            self.png_compress_level = preset_data.get("png_compress_level", 1)
+            self.png_all_pages = preset_data.get("png_all_pages", False)
+            self.render_colorspace = preset_data.get("render_colorspace", "rgb")
+            self.ppt_render_dpi = preset_data.get("ppt_render_dpi", 150)
+            self.ppt_jpeg_quality = preset_data.get("ppt_jpeg_quality", 85)
+            self.raster_flatten_dpi = preset_data.get("raster_flatten_dpi", 150)
+            
             # 加载字体配置
             self.font_base_path = preset_data.get("font_base_path", "resources/fonts")  # 新增：字体库路径
             self.default_font = preset_data.get("default_font", "calibri")
@@ -749,7 +1399,7 @@ class ExcelToPDFProcessor:
             
             success_msg = "预设加载成功"
             self.logger.info(f"预设配置加载成功: {preset_path}")
-            self.logger.debug(f"加载的配置: {preset_data}")
+            self.logger.debug("加载的配置: %s", preset_data)
             return True, success_msg
         except Exception as e:
             error_msg = f"预设加载失败: {e}"
@@ -762,7 +1412,7 @@ class ExcelToPDFProcessor:
         
         self.excel_path = ""
         self.pdf_template_path = ""
-        self.output_folder = str(Path.home() / "Desktop")
+        self.output_folder = _DESKTOP_PATH
         self.sheet_name = None
         self.title_row = 3
         self.start_row = 4
@@ -772,6 +1422,16 @@ class ExcelToPDFProcessor:
         self.flatten_form = True
         self.output_png = False
         self.output_ppt = False
+        self.clear_excel_cache()
+        
+        # 重置渲染配置
+        self.png_render_dpi = 144
+        self.png_compress_level = 1
+        self.png_all_pages = False
+        self.render_colorspace = "rgb"
+        self.ppt_render_dpi = 150
+        self.ppt_jpeg_quality = 85
+        self.raster_flatten_dpi = 150
         
         # 重置字体配置
         self.font_base_path = "resources/fonts"
@@ -786,198 +1446,207 @@ class ExcelToPDFProcessor:
 
     def get_desktop_path(self):
         """获取桌面路径"""
-        return str(Path.home() / "Desktop")
+        return _DESKTOP_PATH
     
 
 
     def flatten_form_with_textbox(self, doc, output_pdf_path, data_dict, image_dict=None):
-        """使用insert_text方式扁平化表单，参考用户示例代码的简单直接方法"""
+        """
+        使用insert_text方式扁平化表单，参考用户示例代码的简单直接方法
+        页面以矢量方式复制；复选框、边框、底色等控件外观先烘焙为页面内容，随页面一起保留
+        """
+        new_doc = None
         try:
+            # 先收集需要用insert_text绘制的文本字段（烘焙后页面上不再有控件对象）
+            # 每页为 [(字段名, 值, 字段矩形, 字段字号, 备用方案字号)]
+            text_fields = []
+            for page in doc:
+                page_fields = []
+                image_xrefs = []
+                for widget in page.widgets():
+                    field_name = widget.field_name
+                    
+                    # 图片字段在填充阶段已插入原页面内容，删除控件以免其外观盖住图片
+                    if image_dict and field_name in image_dict:
+                        image_xrefs.append(widget.xref)
+                        continue
+                    
+                    # 只有非空值才绘制
+                    if field_name in data_dict:
+                        value = str(data_dict[field_name])
+                        if value:
+                            page_fields.append((field_name, value, widget.rect,
+                                                self._parse_widget_fontsize(widget, default=22),
+                                                self._parse_widget_fontsize(widget, default=14)))
+                for xref in image_xrefs:
+                    page.delete_widget(page.load_widget(xref))
+                text_fields.append(page_fields)
+            
+            # 把控件和注释的外观流转为页面内容，show_pdf_page 只复制页面内容，不包含注释
+            baked = _bake_form_appearances(doc)
+            
             # 创建新文档，复制原文档的页面但不包含表单字段
             new_doc = fitz.open()
             
-            for page_num in range(len(doc)):
+            # 字体文件 -> fontname，整个文档共用同一字体名，MuPDF按字体内容复用已嵌入的字体对象
+            embedded_fonts = {}
+            
+            for page_num, page_fields in enumerate(text_fields):
                 page = doc[page_num]
                 
                 # 创建新页面，复制原页面尺寸
                 new_page = new_doc.new_page(width=page.rect.width, height=page.rect.height)
                 
-                # 复制原页面的内容（不包括表单字段）
-                # 先渲染原页面为图片，然后插入到新页面
-                pix = page.get_pixmap(alpha=False)
-                new_page.insert_image(new_page.rect, pixmap=pix)
+                if baked:
+                    # show_pdf_page 直接引用原页面的矢量内容（已包含控件外观和填充阶段插入的图片）
+                    new_page.show_pdf_page(new_page.rect, doc, page_num)
+                else:
+                    # 当前PyMuPDF版本无法烘焙控件外观时，按原方式渲染整页（含控件外观）后插入
+                    pix = page.get_pixmap(alpha=False)
+                    new_page.insert_image(new_page.rect, pixmap=pix)
+                    pix = None
                 
-                # 字体嵌入字典，用于存储已嵌入的字体
-                embedded_fonts = {}
+                # 当前页面已注册的fontname，同一页面每个字体只注册一次
+                page_fonts = set()
                 
-                # 获取原页面的表单字段并在新页面上用insert_text重新绘制
-                widgets = page.widgets()
-                for widget in widgets:
-                    field_name = widget.field_name
-                    
-                    # 处理图片字段
-                    if image_dict and field_name in image_dict:
-                        image_path = image_dict[field_name]
-                        if image_path and os.path.exists(image_path):
-                            try:
-                                # 获取字段的矩形区域
-                                field_rect = widget.rect
-                                # 在新页面插入图片
-                                new_page.insert_image(field_rect, filename=image_path, overlay=True)
-                                self.logger.debug(f"成功在字段 '{field_name}' 位置插入图片")
-                            except Exception as e:
-                                self.logger.error(f"在字段 '{field_name}' 位置插入图片失败: {e}")
-                        continue
-                    
-                    # 处理文本字段
-                    if field_name in data_dict:
-                        value = str(data_dict[field_name])
-                        if value:  # 只有非空值才绘制
-                            # 获取字段的矩形区域
-                            field_rect = widget.rect
-                            
-                            try:
-                                # 根据表单域设置的字体大小作为初始字号（支持'xx pt'）
-                                fontfile = self.get_appropriate_font_path(value, self.default_font, self.chinese_font)
-                                
-                                # 获取原始字体大小，直接使用不进行调整
-                                font_size = self._parse_widget_fontsize(widget, default=22)
-                                color = (0, 0, 0)  # 黑色
-                                
-                                # 详细记录用户字体选择和应用情况
-                                has_chinese = self.has_chinese_characters(value)
-                                selected_font_name = self.chinese_font if has_chinese else self.default_font
-                                
-                                self.logger.info(f"=== 字段 '{field_name}' 字体应用详情 ===")
-                                self.logger.info(f"  填充内容: '{value}' (长度: {len(value)})")
-                                self.logger.info(f"  包含中文: {has_chinese}")
-                                self.logger.info(f"  用户选择的默认字体: {self.default_font}")
-                                self.logger.info(f"  用户选择的中文字体: {self.chinese_font}")
-                                self.logger.info(f"  本次应该使用的字体: {selected_font_name}")
-                                self.logger.info(f"  字体文件路径: {fontfile if fontfile else '未找到字体文件，将使用系统默认字体'}")
-                                self.logger.info(f"  表单域字体大小: {font_size}pt")
-                                
-                                # 嵌入字体并获得fontname
-                                fontname = None
-                                if fontfile and os.path.exists(fontfile):
-                                    # 检查是否已经嵌入过这个字体
-                                    if fontfile not in embedded_fonts:
-                                        try:
-                                            # 先把字体嵌入并得到fontname
-                                            fontname = f"CustomFont_{len(embedded_fonts)}"  # 生成唯一字体名
-                                            xref = new_page.insert_font(fontname=fontname, fontfile=fontfile)
-                                            embedded_fonts[fontfile] = fontname
-                                            self.logger.info(f"  ✓ 字体嵌入成功: {os.path.basename(fontfile)} -> fontname={fontname}")
-                                        except Exception as font_error:
-                                            self.logger.warning(f"  ✗ 字体嵌入失败: {font_error}")
-                                            fontname = None
-                                    else:
-                                        fontname = embedded_fonts[fontfile]
-                                        self.logger.info(f"  ✓ 使用已嵌入字体: {os.path.basename(fontfile)} -> fontname={fontname}")
-                                else:
-                                    self.logger.warning(f"  ✗ 字体文件不存在或路径无效，将使用系统默认字体")
-                                
-                                # 计算垂直居中的Y位置（参考用户示例代码）
-                                text_height = font_size
-                                center_y = (field_rect.y0 + field_rect.y1) / 2
-                                insert_x = field_rect.x0
-                                insert_y = center_y - text_height / 2 + text_height * 0.75
-                                
-                                # 使用insert_text直接插入文本（参考用户示例代码）
-                                new_page.insert_text(
-                                    fitz.Point(insert_x, insert_y),
-                                    value,
-                                    fontname=fontname,
-                                    fontsize=font_size,
-                                    color=color,
-                                )
-                                
-                                self.logger.info(f"  ✓ 文本插入成功: 字号={font_size}pt, 位置=({insert_x:.1f}, {insert_y:.1f})")
-                                self.logger.info(f"  字段矩形: {field_rect}")
-                                self.logger.info(f"=== 字段 '{field_name}' 处理完成 ===")
-                                
-                            except Exception as e:
-                                self.logger.error(f"在字段 '{field_name}' 位置插入文本失败: {e}")
-                                # 备用方案：使用系统默认字体
+                # 在新页面上用insert_text重新绘制文本字段
+                for field_name, value, field_rect, widget_font_size, fallback_font_size in page_fields:
+                    try:
+                        # 根据表单域设置的字体大小作为初始字号（支持'xx pt'）
+                        fontfile = self.get_appropriate_font_path(value, self.default_font, self.chinese_font)
+                        
+                        # 获取原始字体大小，直接使用不进行调整
+                        font_size = widget_font_size
+                        color = (0, 0, 0)  # 黑色
+                        
+                        # 详细记录字体选择和应用情况（仅DEBUG级别）
+                        self.logger.debug("字段 '%s' 字体应用详情: 内容='%s', 默认字体=%s, 中文字体=%s, 字体文件=%s, 字号=%spt",
+                                          field_name, value, self.default_font, self.chinese_font,
+                                          fontfile or '未找到字体文件，将使用系统默认字体', font_size)
+                        
+                        # 嵌入字体并获得fontname
+                        fontname = None
+                        if fontfile:
+                            # 同一字体文件在整个文档中只分配一个fontname
+                            fontname = embedded_fonts.get(fontfile)
+                            if fontname is None:
+                                fontname = f"CustomFont_{len(embedded_fonts)}"  # 生成唯一字体名
+                                embedded_fonts[fontfile] = fontname
+                            # 字体资源按页面引用，只在该页面第一次使用时注册
+                            if fontname not in page_fonts:
                                 try:
-                                    font_size = self._parse_widget_fontsize(widget, default=14)
-                                    text_height = font_size
-                                    center_y = (field_rect.y0 + field_rect.y1) / 2
-                                    insert_x = field_rect.x0
-                                    insert_y = center_y - text_height / 2 + text_height * 0.75
-                                    
-                                    self.logger.info(f"  === 启动备用方案（系统默认字体） ===")
-                                    
-                                    new_page.insert_text(
-                                        fitz.Point(insert_x, insert_y),
-                                        value,
-                                        fontname=None,  # 使用系统默认字体
-                                        fontsize=font_size,
-                                        color=(0, 0, 0),
-                                    )
-                                    
-                                    self.logger.info(f"  ✓ 备用方案成功: 字号={font_size}pt")
-                                    self.logger.info(f"=== 字段 '{field_name}' 备用方案完成 ===")
-                                except Exception as e2:
-                                    self.logger.error(f"  ✗ 备用方案也失败: {e2}")
-                                    self.logger.error(f"=== 字段 '{field_name}' 处理失败 ===")
+                                    new_page.insert_font(fontname=fontname, fontfile=fontfile)
+                                    page_fonts.add(fontname)
+                                    self.logger.debug("  ✓ 字体嵌入成功: %s -> fontname=%s", fontfile, fontname)
+                                except Exception as font_error:
+                                    self.logger.warning(f"  ✗ 字体嵌入失败: {font_error}")
+                                    fontname = None
+                            else:
+                                self.logger.debug("  ✓ 使用已嵌入字体: %s -> fontname=%s", fontfile, fontname)
+                        else:
+                            # 未配置字体时每个字段都会走到这里，属于正常回退，不逐字段记录警告
+                            self.logger.debug("  ✗ 未找到可用字体文件，将使用系统默认字体")
+                        
+                        # 计算垂直居中的Y位置（参考用户示例代码）
+                        text_height = font_size
+                        center_y = (field_rect.y0 + field_rect.y1) / 2
+                        insert_x = field_rect.x0
+                        insert_y = center_y - text_height / 2 + text_height * 0.75
+                        
+                        # 使用insert_text直接插入文本（参考用户示例代码）
+                        new_page.insert_text(
+                            fitz.Point(insert_x, insert_y),
+                            value,
+                            fontname=fontname,
+                            fontsize=font_size,
+                            color=color,
+                        )
+                        
+                        self.logger.debug("  ✓ 字段 '%s' 文本插入成功: 字号=%spt, 位置=(%.1f, %.1f), 字段矩形=%s",
+                                          field_name, font_size, insert_x, insert_y, field_rect)
+                        
+                    except Exception as e:
+                        self.logger.error(f"在字段 '{field_name}' 位置插入文本失败: {e}")
+                        # 备用方案：使用系统默认字体
+                        try:
+                            font_size = fallback_font_size
+                            text_height = font_size
+                            center_y = (field_rect.y0 + field_rect.y1) / 2
+                            insert_x = field_rect.x0
+                            insert_y = center_y - text_height / 2 + text_height * 0.75
+                            
+                            self.logger.debug("  === 启动备用方案（系统默认字体） ===")
+                            
+                            new_page.insert_text(
+                                fitz.Point(insert_x, insert_y),
+                                value,
+                                fontname=None,  # 使用系统默认字体
+                                fontsize=font_size,
+                                color=(0, 0, 0),
+                            )
+                            
+                            self.logger.debug("  ✓ 字段 '%s' 备用方案成功: 字号=%spt", field_name, font_size)
+                        except Exception as e2:
+                            self.logger.error(f"  ✗ 备用方案也失败: {e2}")
+                            self.logger.error(f"=== 字段 '{field_name}' 处理失败 ===")
             
             # 保存新文档
             new_doc.save(output_pdf_path, deflate=True, clean=True)
-            new_doc.close()
-            self.logger.debug(f"insert_text扁平化完成: {output_pdf_path}")
+            self.logger.debug("insert_text扁平化完成: %s", output_pdf_path)
             
         except Exception as e:
             self.logger.error(f"insert_text扁平化失败: {e}")
             raise
+        finally:
+            if new_doc is not None:
+                new_doc.close()
 
-    def rasterize_flatten_doc(self, doc, output_pdf_path, dpi=200):
-        """将PDF以指定DPI栅格化后重新封装为不可编辑的图像PDF，避免字体替代问题"""
+    def rasterize_flatten_doc(self, doc, output_pdf_path, dpi=150):
+        """
+        将PDF以指定DPI栅格化后重新封装为不可编辑的图像PDF，避免字体替代问题
+        颜色空间与PNG/PPT渲染一致（render_colorspace），灰度时每像素只有1字节
+        """
+        new_doc = None
         try:
             zoom = dpi / 72.0  # 72pt = 1英寸
             mat = fitz.Matrix(zoom, zoom)
+            colorspace = _render_colorspace(self.render_colorspace)
             new_doc = fitz.open()
-            for page in doc:
-                # 渲染为位图
-                pix = page.get_pixmap(matrix=mat, alpha=False)
-                # 新建与原页面同尺寸的页面（以pt为单位）
-                new_page = new_doc.new_page(width=page.rect.width, height=page.rect.height)
-                # 将渲染得到的图片铺满页面
-                new_page.insert_image(new_page.rect, pixmap=pix)
+            for page_num, page in enumerate(doc, start=1):
+                # 渲染为不带透明通道的位图
+                pix = page.get_pixmap(matrix=mat, colorspace=colorspace, alpha=False)
+                try:
+                    # 新建与原页面同尺寸的页面（以pt为单位）
+                    new_page = new_doc.new_page(width=page.rect.width, height=page.rect.height)
+                    # 将渲染得到的图片铺满页面
+                    new_page.insert_image(new_page.rect, pixmap=pix)
+                finally:
+                    # 出错时同样立即释放像素缓冲区
+                    pix = None
+                # 多页文档定期清空MuPDF的资源缓存，内存占用保持在约一页的水平
+                if page_num % RASTER_STORE_SHRINK_PAGES == 0:
+                    fitz.TOOLS.store_shrink(100)
             # 保存图像PDF
             new_doc.save(output_pdf_path, deflate=True, clean=True)
-            new_doc.close()
-            self.logger.debug(f"栅格化扁平化完成: {output_pdf_path}")
+            self.logger.debug("栅格化扁平化完成: %s", output_pdf_path)
         except Exception as e:
             self.logger.error(f"栅格化扁平化失败: {e}")
             raise
+        finally:
+            if new_doc is not None:
+                new_doc.close()
+            fitz.TOOLS.store_shrink(100)
     
-    def convert_pdf_to_png(self, pdf_path, output_folder):
-        """将PDF转换为PNG图片"""
+    def convert_pdf_to_png(self, pdf_path, output_folder, dpi=144):
+        """
+        将PDF转换为PNG图片，dpi为渲染分辨率（72即原始尺寸）
+        """
         try:
-            pdf_name = Path(pdf_path).stem
-            png_path = os.path.join(output_folder, f"{pdf_name}.png")
-            
-            # 打开PDF文件
-            pdf_doc = fitz.open(pdf_path)
-            
-            # 获取第一页（假设PDF只有一页）
-            page = pdf_doc[0]
-            
-            # 设置缩放比例以获得高质量图片
-            zoom = 2.0  # 缩放比例
-            mat = fitz.Matrix(zoom, zoom)
-            
-            # 渲染页面为图片
-            pix = page.get_pixmap(matrix=mat)
-            
-            # 保存为PNG
-            pix.save(png_path)
-            
-            pdf_doc.close()
+            png_path = _render_pdf_to_png(pdf_path, output_folder, dpi / 72.0, self.render_colorspace,
+                                          self.png_compress_level, self.png_all_pages)
             
             self.logger.info(f"PDF转PNG成功: {png_path}")
-            self.log_to_gui("PDF转PNG", "info", f"成功转换: {pdf_name}.png")
+            self.log_to_gui("PDF转PNG", "info", f"成功转换: {os.path.basename(png_path)}")
             
             return png_path
             
@@ -987,11 +1656,71 @@ class ExcelToPDFProcessor:
             self.log_to_gui("PDF转PNG", "error", error_msg)
             return None
     
-    def create_ppt_from_pdfs(self, pdf_paths, output_folder):
-        """将多个PDF文件合并为一个PPT文件"""
+    def _imap_in_processes(self, func, tasks, operation):
+        """
+        按输入顺序逐个产出 func(task) 的结果，结果一到就可以处理，不必等全部完成。
+        本次运行已启动进程池（见 _start_process_pool）时直接复用；否则任务数达到 PARALLEL_MIN_TASKS
+        才临时启动一个。进程池不可用时剩余任务回退为在当前进程中逐个执行
+        （PyMuPDF不支持多线程，所以用进程而不是线程）
+        """
+        done = 0
+        shared = self._process_pool is not None
+        if len(tasks) > 1 and (shared or (FILL_WORKERS > 1 and len(tasks) >= PARALLEL_MIN_TASKS)):
+            own_executor = None
+            try:
+                if shared:
+                    executor = self._process_pool[0]
+                else:
+                    executor = own_executor = ProcessPoolExecutor(max_workers=min(FILL_WORKERS, len(tasks)))
+                for result in executor.map(func, tasks, chunksize=4):
+                    done += 1
+                    yield result
+                return
+            except Exception as e:
+                if shared:
+                    self._shutdown_process_pool()
+                self.logger.warning(f"{operation}并行处理失败，改为逐个处理: {e}")
+            finally:
+                if own_executor is not None:
+                    own_executor.shutdown()
+        for task in tasks[done:]:
+            yield func(task)
+    
+    def _map_in_processes(self, func, tasks, operation):
+        """按输入顺序返回 func(task) 的结果列表，见 _imap_in_processes"""
+        return list(self._imap_in_processes(func, tasks, operation))
+    
+    def convert_pdfs_to_png(self, pdf_paths, output_folder, dpi=144):
+        """批量将PDF转换为PNG图片，多个文件时使用进程池并行渲染，返回按输入顺序排列的PNG路径"""
+        zoom = dpi / 72.0
+        tasks = [(pdf, output_folder, zoom, self.render_colorspace, self.png_compress_level, self.png_all_pages)
+                 for pdf in pdf_paths]
+        results = self._map_in_processes(_pdf_to_png_worker, tasks, "PNG转换")
+        
+        png_paths = []
+        for pdf_path, (png_path, error) in zip(pdf_paths, results):
+            if png_path:
+                png_paths.append(png_path)
+                self.logger.info(f"PDF转PNG成功: {png_path}")
+                self.log_to_gui_buffered("PDF转PNG", "info", f"成功转换: {os.path.basename(png_path)}")
+            else:
+                error_msg = f"PDF转PNG失败: {error}"
+                self.logger.error(f"{error_msg} ({pdf_path})")
+                self.log_to_gui("PDF转PNG", "error", error_msg)
+        self.flush_gui_logs()
+        return png_paths
+    
+    def create_ppt_from_pdfs(self, pdf_paths, output_folder, png_paths=None):
+        """
+        将多个PDF文件合并为一个PPT文件
+        png_paths 为本次按 png_render_dpi 导出的PNG，分辨率足够时直接使用，不再重复渲染
+        """
         try:
-            # 临时增加PIL的图像大小限制
+            # PPT相关库只在需要输出PPT时才加载
             from PIL import Image
+            from pptx import Presentation
+            
+            # 临时增加PIL的图像大小限制
             original_max_image_pixels = Image.MAX_IMAGE_PIXELS
             Image.MAX_IMAGE_PIXELS = None  # 临时移除限制
             
@@ -999,79 +1728,43 @@ class ExcelToPDFProcessor:
             prs = Presentation()
             
             # 设置幻灯片尺寸为A4比例
-            prs.slide_width = Inches(10)
-            prs.slide_height = Inches(7.5)
+            prs.slide_width = _SLIDE_WIDTH
+            prs.slide_height = _SLIDE_HEIGHT
             
-            for pdf_path in pdf_paths:
+            # 所有幻灯片共用的布局和添加方法
+            slide_layout = prs.slide_layouts[6]  # 空白布局
+            add_slide = prs.slides.add_slide
+            rendered_pngs = {Path(p).stem: p for p in (png_paths or [])}
+            
+            # 各页面并行渲染，幻灯片按原顺序添加
+            png_zoom = self.png_render_dpi / 72.0
+            tasks = [(pdf_path, rendered_pngs.get(Path(pdf_path).stem), png_zoom,
+                      self.ppt_jpeg_quality, self.ppt_render_dpi, self.render_colorspace)
+                     for pdf_path in pdf_paths]
+            # 渲染结果按顺序到达即加入幻灯片，不在内存中攒下全部页面图片
+            pictures = self._imap_in_processes(_render_ppt_picture, tasks, "PPT页面渲染")
+            
+            for pdf_path, (picture, info, error) in zip(pdf_paths, pictures):
+                pdf_name = os.path.basename(pdf_path)
                 try:
-                    # 打开PDF文件
-                    pdf_doc = fitz.open(pdf_path)
-                    
-                    # 获取第一页
-                    page = pdf_doc[0]
-                    
-                    # 获取页面尺寸
-                    page_rect = page.rect
-                    page_width = page_rect.width
-                    page_height = page_rect.height
-                    
-                    # 计算安全的缩放比例，避免生成过大的图像
-                    # 限制最大像素数为150M像素（约为PIL默认限制的85%）
-                    max_pixels = 150_000_000
-                    current_pixels = page_width * page_height
-                    
-                    if current_pixels > 0:
-                        max_zoom = (max_pixels / current_pixels) ** 0.5
-                        # 选择较小的缩放比例，但至少为0.5以保证质量
-                        zoom = min(2.0, max(0.5, max_zoom))
-                    else:
-                        zoom = 1.0
-                    
-                    self.logger.info(f"PDF页面尺寸: {page_width:.1f}x{page_height:.1f}, 使用缩放比例: {zoom:.2f}")
-                    
-                    mat = fitz.Matrix(zoom, zoom)
-                    
-                    # 渲染页面为图片
-                    pix = page.get_pixmap(matrix=mat)
-                    
-                    # 检查生成的图像尺寸
-                    img_width = pix.width
-                    img_height = pix.height
-                    total_pixels = img_width * img_height
-                    
-                    self.logger.info(f"生成图像尺寸: {img_width}x{img_height}, 总像素数: {total_pixels:,}")
-                    
-                    # 将图片数据转换为PIL Image
-                    img_data = pix.tobytes("png")
-                    
-                    # 创建临时图片文件
-                    temp_img_path = os.path.join(output_folder, f"temp_{Path(pdf_path).stem}.png")
-                    with open(temp_img_path, "wb") as f:
-                        f.write(img_data)
-                    
-                    # 添加新幻灯片
-                    slide_layout = prs.slide_layouts[6]  # 空白布局
-                    slide = prs.slides.add_slide(slide_layout)
-                    
-                    # 添加图片到幻灯片
-                    left = Inches(0.5)
-                    top = Inches(0.5)
-                    width = Inches(9)
-                    height = Inches(6.5)
-                    
-                    slide.shapes.add_picture(temp_img_path, left, top, width, height)
+                    if picture is None:
+                        raise RuntimeError(error)
+                    self.logger.info(info)
                     
-                    # 删除临时图片文件
-                    os.remove(temp_img_path)
+                    # 图片数据直接在内存中交给PPT，不再写临时文件
+                    if isinstance(picture, bytes):
+                        picture = BytesIO(picture)
                     
-                    pdf_doc.close()
+                    # 添加新幻灯片并放入图片
+                    slide = add_slide(slide_layout)
+                    slide.shapes.add_picture(picture, _PICTURE_LEFT, _PICTURE_TOP, _PICTURE_WIDTH, _PICTURE_HEIGHT)
                     
-                    self.logger.info(f"成功处理PDF文件: {Path(pdf_path).name}")
+                    self.logger.info(f"成功处理PDF文件: {pdf_name}")
                     
                 except Exception as e:
                     error_msg = f"处理PDF文件 {pdf_path} 时出错: {str(e)}"
                     self.logger.warning(error_msg)
-                    self.log_to_gui("PPT处理", "warning", f"跳过文件 {Path(pdf_path).name}: {str(e)[:50]}...")
+                    self.log_to_gui("PPT处理", "warning", f"跳过文件 {pdf_name}: {str(e)[:50]}...")
                     continue
             
             # 恢复PIL的原始限制
@@ -1089,7 +1782,6 @@ class ExcelToPDFProcessor:
         except Exception as e:
             # 确保恢复PIL的原始限制
             try:
-                from PIL import Image
                 Image.MAX_IMAGE_PIXELS = original_max_image_pixels
             except:
                 pass
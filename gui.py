@@ -6,10 +6,14 @@ import sys
 import socket
 from pathlib import Path
 import threading
+import multiprocessing
 from datetime import datetime
 from core import ExcelToPDFProcessor
 from font_manager import FontManagerWindow
 
+# 渲染颜色下拉框显示文字 -> 处理器的 render_colorspace
+_COLORSPACE_LABELS = {"彩色": "rgb", "灰度": "gray"}
+
 
 class ExcelToPDFGUI:
     # 类级别的标志，防止重复检测
@@ -30,7 +34,7 @@ class ExcelToPDFGUI:
         # 初始化处理器
         self.processor = ExcelToPDFProcessor()
         # 设置处理器的日志回调
-        self.processor.set_gui_log_callback(self.add_operation_log)
+        self.processor.set_gui_log_callback(self.add_operation_log, self.add_operation_logs)
         
         # 初始化字体相关变量
         self.default_font_combo = None
@@ -48,6 +52,15 @@ class ExcelToPDFGUI:
         self.output_png_var = tk.BooleanVar(value=False)
         self.output_ppt_var = tk.BooleanVar(value=False)
         
+        # 渲染配置相关变量
+        self.png_render_dpi_var = tk.IntVar(value=144)
+        self.png_compress_level_var = tk.IntVar(value=1)
+        self.png_all_pages_var = tk.BooleanVar(value=False)
+        self.render_colorspace_var = tk.StringVar(value="彩色")
+        self.ppt_render_dpi_var = tk.IntVar(value=150)
+        self.ppt_jpeg_quality_var = tk.IntVar(value=85)
+        self.raster_flatten_dpi_var = tk.IntVar(value=150)
+        
         # 字体选择相关变量
         self.default_font_var = tk.StringVar()
         self.chinese_font_var = tk.StringVar()
@@ -159,36 +172,45 @@ class ExcelToPDFGUI:
         
     def add_operation_log(self, operation, level="info", message=""):
         """添加操作日志"""
+        self.add_operation_logs([(operation, level, message)])
+        
+    def add_operation_logs(self, entries):
+        """
+        批量添加操作日志，entries 为 (operation, level, message) 列表，只刷新一次界面
+        单条和批量日志都经 after 交给主线程按调用顺序写入，处理线程中调用也不会乱序
+        """
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = {
-            "timestamp": timestamp,
-            "operation": operation,
-            "level": level,
-            "message": message
-        }
+        log_entries = [
+            {"timestamp": timestamp, "operation": operation, "level": level, "message": message}
+            for operation, level, message in entries
+        ]
+        if log_entries:
+            self.root.after(0, lambda: self._append_log_entries(log_entries))
         
-        # 添加到日志列表
-        self.operation_logs.append(log_entry)
+    def _append_log_entries(self, log_entries):
+        """在主线程中记录日志并一次性插入显示"""
+        self.operation_logs.extend(log_entries)
         
         # 限制日志数量
         if len(self.operation_logs) > self.max_logs:
-            self.operation_logs.pop(0)
+            del self.operation_logs[:-self.max_logs]
         
         # 更新显示
-        self.update_log_display(log_entry)
+        self.update_log_display(*log_entries)
         
-    def update_log_display(self, log_entry):
-        """更新日志显示"""
+    def update_log_display(self, *log_entries):
+        """更新日志显示，可一次插入多条"""
         self.log_text.config(state=tk.NORMAL)
         
-        # 格式化日志条目
-        log_line = f"[{log_entry['timestamp']}] {log_entry['operation']}"
-        if log_entry['message']:
-            log_line += f": {log_entry['message']}"
-        log_line += "\n"
-        
-        # 插入日志
-        self.log_text.insert(tk.END, log_line, log_entry['level'])
+        for log_entry in log_entries:
+            # 格式化日志条目
+            log_line = f"[{log_entry['timestamp']}] {log_entry['operation']}"
+            if log_entry['message']:
+                log_line += f": {log_entry['message']}"
+            log_line += "\n"
+            
+            # 插入日志
+            self.log_text.insert(tk.END, log_line, log_entry['level'])
         
         # 自动滚动到底部
         self.log_text.see(tk.END)
@@ -308,6 +330,30 @@ class ExcelToPDFGUI:
         ttk.Checkbutton(options_frame, text="输出PNG图片", variable=self.output_png_var).pack(side=tk.LEFT, padx=(20,0))
         ttk.Checkbutton(options_frame, text="输出PPT", variable=self.output_ppt_var).pack(side=tk.LEFT, padx=(20,0))
         
+        # 第四行：PNG渲染选项
+        png_frame = ttk.Frame(config_frame)
+        png_frame.grid(row=3, column=0, columnspan=9, sticky=(tk.W, tk.E), pady=(8,2))
+        
+        ttk.Label(png_frame, text="PNG DPI:").pack(side=tk.LEFT)
+        ttk.Spinbox(png_frame, from_=72, to=600, increment=24, textvariable=self.png_render_dpi_var, width=6).pack(side=tk.LEFT, padx=(2,10))
+        ttk.Label(png_frame, text="压缩级别:").pack(side=tk.LEFT)
+        ttk.Spinbox(png_frame, from_=0, to=9, textvariable=self.png_compress_level_var, width=4).pack(side=tk.LEFT, padx=(2,10))
+        ttk.Label(png_frame, text="颜色:").pack(side=tk.LEFT)
+        ttk.Combobox(png_frame, textvariable=self.render_colorspace_var, values=list(_COLORSPACE_LABELS),
+                     width=6, state="readonly").pack(side=tk.LEFT, padx=(2,10))
+        ttk.Checkbutton(png_frame, text="导出所有页面", variable=self.png_all_pages_var).pack(side=tk.LEFT)
+        
+        # 第五行：PPT和栅格化扁平化渲染选项
+        ppt_frame = ttk.Frame(config_frame)
+        ppt_frame.grid(row=4, column=0, columnspan=9, sticky=(tk.W, tk.E), pady=(8,2))
+        
+        ttk.Label(ppt_frame, text="PPT DPI:").pack(side=tk.LEFT)
+        ttk.Spinbox(ppt_frame, from_=72, to=600, increment=24, textvariable=self.ppt_render_dpi_var, width=6).pack(side=tk.LEFT, padx=(2,10))
+        ttk.Label(ppt_frame, text="JPEG质量:").pack(side=tk.LEFT)
+        ttk.Spinbox(ppt_frame, from_=10, to=100, increment=5, textvariable=self.ppt_jpeg_quality_var, width=5).pack(side=tk.LEFT, padx=(2,10))
+        ttk.Label(ppt_frame, text="栅格化扁平化DPI:").pack(side=tk.LEFT)
+        ttk.Spinbox(ppt_frame, from_=72, to=600, increment=24, textvariable=self.raster_flatten_dpi_var, width=6).pack(side=tk.LEFT, padx=(2,0))
+        
     def create_field_mapping_section(self, parent, row):
         """创建字段映射区域"""
         mapping_frame = ttk.LabelFrame(parent, text="字段映射配置", padding="5")
@@ -683,6 +729,15 @@ class ExcelToPDFGUI:
         self.output_png_var.set(self.processor.output_png)
         self.output_ppt_var.set(self.processor.output_ppt)
         
+        # 更新渲染配置
+        self.png_render_dpi_var.set(self.processor.png_render_dpi)
+        self.png_compress_level_var.set(self.processor.png_compress_level if self.processor.png_compress_level is not None else 6)
+        self.png_all_pages_var.set(self.processor.png_all_pages)
+        self.render_colorspace_var.set("灰度" if self.processor.render_colorspace == "gray" else "彩色")
+        self.ppt_render_dpi_var.set(self.processor.ppt_render_dpi)
+        self.ppt_jpeg_quality_var.set(self.processor.ppt_jpeg_quality or 85)
+        self.raster_flatten_dpi_var.set(self.processor.raster_flatten_dpi)
+        
         # 更新字体配置
         self.default_font_var.set(getattr(self.processor, 'default_font', ''))
         self.chinese_font_var.set(getattr(self.processor, 'chinese_font', ''))
@@ -728,6 +783,15 @@ class ExcelToPDFGUI:
         self.processor.output_png = self.output_png_var.get()
         self.processor.output_ppt = self.output_ppt_var.get()
         
+        # 更新渲染配置
+        self.processor.png_render_dpi = self.png_render_dpi_var.get()
+        self.processor.png_compress_level = min(9, max(0, self.png_compress_level_var.get()))
+        self.processor.png_all_pages = self.png_all_pages_var.get()
+        self.processor.render_colorspace = _COLORSPACE_LABELS.get(self.render_colorspace_var.get(), "rgb")
+        self.processor.ppt_render_dpi = self.ppt_render_dpi_var.get()
+        self.processor.ppt_jpeg_quality = min(100, max(1, self.ppt_jpeg_quality_var.get()))
+        self.processor.raster_flatten_dpi = self.raster_flatten_dpi_var.get()
+        
         # 更新字体配置
         self.processor.default_font = self.default_font_var.get().strip()
         self.processor.chinese_font = self.chinese_font_var.get().strip()
@@ -941,5 +1005,7 @@ class ExcelToPDFGUI:
 
 
 if __name__ == "__main__":
+    # 打包后的程序在子进程（并行填充PDF）中需要此调用
+    multiprocessing.freeze_support()
     app = ExcelToPDFGUI()
     app.run()
\ No newline at end of file
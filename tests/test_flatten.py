@@ -0,0 +1,53 @@
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from core import ExcelToPDFProcessor
+
+
+CHECKBOX_RECT = (100, 100, 130, 130)
+
+
+def _make_template():
+    """生成带一个已勾选复选框和一个文本框的表单模板"""
+    doc = fitz.open()
+    page = doc.new_page()
+
+    checkbox = fitz.Widget()
+    checkbox.field_type = fitz.PDF_WIDGET_TYPE_CHECKBOX
+    checkbox.field_name = "agree"
+    checkbox.rect = fitz.Rect(CHECKBOX_RECT)
+    checkbox.field_value = True
+    page.add_widget(checkbox)
+
+    text = fitz.Widget()
+    text.field_type = fitz.PDF_WIDGET_TYPE_TEXT
+    text.field_name = "name"
+    text.rect = fitz.Rect(100, 200, 300, 230)
+    text.border_color = (0, 0, 0)
+    text.fill_color = (0.9, 0.9, 0.9)
+    page.add_widget(text)
+    return doc
+
+
+def _non_white_pixels(page, rect):
+    pix = page.get_pixmap(clip=fitz.Rect(rect), colorspace=fitz.csGRAY, alpha=False)
+    return sum(1 for value in pix.samples if value < 250)
+
+
+def test_checkbox_survives_textbox_flatten(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    processor = ExcelToPDFProcessor()
+    template = _make_template()
+    before = _non_white_pixels(template[0], CHECKBOX_RECT)
+    assert before > 0
+
+    output = tmp_path / "flat.pdf"
+    processor.flatten_form_with_textbox(template, str(output), {"name": "张三"})
+    template.close()
+
+    with fitz.open(output) as flat:
+        page = flat[0]
+        # 扁平化后不再有表单控件，但复选框外观应保留在页面内容中
+        assert page.first_widget is None
+        assert _non_white_pixels(page, CHECKBOX_RECT) > 0
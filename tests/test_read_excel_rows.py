@@ -0,0 +1,44 @@
+from datetime import date, datetime, time
+
+import pytest
+
+pytest.importorskip("fitz")
+openpyxl = pytest.importorskip("openpyxl")
+pytest.importorskip("python_calamine")
+
+import core
+from core import ExcelToPDFProcessor
+
+
+def _make_workbook(path):
+    """生成包含整数、小数、空单元格、日期和时间的工作表"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "数据"
+    ws.append(["姓名", "数量", "单价", "备注", "日期", "时间"])
+    ws.append(["张三", 3, 12.5, None, date(2024, 1, 5), time(8, 30)])
+    ws.append(["李四", 0, 1.0, "无", datetime(2024, 2, 29, 14, 15), time(23, 59, 59)])
+    ws["E2"].number_format = "yyyy-mm-dd"
+    ws["E3"].number_format = "yyyy-mm-dd hh:mm"
+    ws["F2"].number_format = ws["F3"].number_format = "hh:mm:ss"
+    wb.save(path)
+
+
+def test_calamine_rows_match_openpyxl(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    xlsx_path = str(tmp_path / "data.xlsx")
+    _make_workbook(xlsx_path)
+    processor = ExcelToPDFProcessor()
+
+    calamine_result = processor._read_excel_rows_calamine(xlsx_path)
+    monkeypatch.setattr(core, "CalamineWorkbook", None)
+    openpyxl_result = processor._read_excel_rows_uncached(xlsx_path)
+
+    assert calamine_result == openpyxl_result
+    title, rows = calamine_result
+    assert title == "数据"
+    assert rows[1][1] == 3 and type(rows[1][1]) is int
+    assert rows[1][3] is None
+    assert rows[1][4] == datetime(2024, 1, 5)
+    # 填入PDF时按 str() 转换，两种读取方式的文本也必须一致
+    assert [str(v) for v in calamine_result[1][2]] == [str(v) for v in openpyxl_result[1][2]]
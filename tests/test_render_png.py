@@ -0,0 +1,36 @@
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from core import _render_page_png_tiled
+
+
+def _make_page():
+    """生成带文字、线条和色块的单页文档，内容覆盖整页以便比较每一行像素"""
+    doc = fitz.open()
+    page = doc.new_page(width=301, height=397)
+    page.draw_rect(fitz.Rect(20, 20, 281, 377), color=(0, 0, 0), fill=(0.2, 0.6, 0.9), width=2)
+    page.draw_line(fitz.Point(0, 0), fitz.Point(301, 397), color=(1, 0, 0), width=3)
+    page.insert_text(fitz.Point(40, 200), "strip 0123456789", fontsize=24)
+    return doc
+
+
+@pytest.mark.parametrize("colorspace, cs", [("rgb", fitz.csRGB), ("gray", fitz.csGRAY)])
+def test_tiled_png_matches_full_render(colorspace, cs):
+    doc = _make_page()
+    page = doc[0]
+    zoom = 1.37  # 非整数缩放，条带边界落在小数坐标上
+    # 很小的条高，强制分成多条并经过重叠行的跳过逻辑
+    png = _render_page_png_tiled(page, zoom, colorspace, compress_level=1, tile_px=37)
+
+    expected = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False, colorspace=cs)
+    decoded = fitz.Pixmap(png)
+    assert (decoded.width, decoded.height, decoded.n) == (expected.width, expected.height, expected.n)
+
+    # 逐行比较（按各自的 stride 取有效像素），允许抗锯齿造成的微小差异
+    row_len = expected.width * expected.n
+    for y in range(expected.height):
+        got = decoded.samples[y * decoded.stride:y * decoded.stride + row_len]
+        want = expected.samples[y * expected.stride:y * expected.stride + row_len]
+        assert max(abs(a - b) for a, b in zip(got, want)) <= 8, f"第{y}行像素不一致"
+    doc.close()